@@ -1,23 +1,98 @@
 import os
 import sys
 
-from src.meta.e2 import e2
+from src.meta.bytecode import BytecodeInterpreter
+from src.meta.closure import ClosureInterpreter
+from src.meta.e2 import load
 from src.meta.interpreter import Interpreter
 from src.meta.parser import Parser
+from src.meta.serialization import SerializationError, read_program, write_program
+from src.meta.stack_interpreter import StackInterpreter
+
+try:
+    from rpython.rlib.objectmodel import we_are_translated
+except ImportError:
+    def we_are_translated():
+        return False
+
+# load the E2 module from its snapshot once, up front: this runs before translation as it reads files with open()
+e2 = load()
 
 
 def read_file(filename):
+    """Read the whole file, usually with a single read sized by fstat; the Tokenizer indexes into the returned string
+    directly so the source is never copied again. Should the file grow while reading, the remaining blocks are joined
+    once at the end rather than appended one by one."""
     fd = os.open(filename, os.O_RDONLY, 0o777)
-    text = ""
+    try:
+        size = os.fstat(fd).st_size
+        chunks = []
+        chunk = os.read(fd, size if size > 0 else 4096)
+        while len(chunk) > 0:
+            chunks.append(chunk)
+            chunk = os.read(fd, 65536)
+    finally:
+        os.close(fd)
+
+    if len(chunks) == 1:
+        return chunks[0]
+    return "".join(chunks)
+
+
+def write_file(filename, data):
+    """Write a temporary file and rename it over the original once complete, as save_file does (which, using open(),
+    cannot be translated), so that a concurrent or interrupted run never leaves a partially written file behind"""
+    temporary = "%s.%d.tmp" % (filename, os.getpid())
+    try:
+        fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while len(data) > 0:
+                written = os.write(fd, data)
+                data = data[written:]
+        finally:
+            os.close(fd)
+        os.rename(temporary, filename)
+    except OSError:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def cache_file(filename):
+    """The precompiled program cache for a source file, e.g. program.e2c for program.e2"""
+    return filename + "c" if filename.endswith(".e2") else filename + ".e2c"
 
-    while True:
-        read = os.read(fd, 4096)
-        if len(read) == 0:
-            break
-        text += read
 
-    os.close(fd)
-    return text
+def source_stamp(filename):
+    """The size and modification time (in microseconds) of a source file; like Python's .pyc files, a cache is only
+    checked against these, so that loading a cached program never reads, let alone hashes, its source"""
+    stat = os.stat(filename)
+    return int(stat.st_size), int(stat.st_mtime * 1000000)
+
+
+def load_program(filename):
+    """Parse the program, unless its cache holds the program parsed from the same source; otherwise, (re)write the
+    cache so that the next run does not need to parse it"""
+    size, mtime = source_stamp(filename)  # taken before reading, so a source changed meanwhile is parsed again
+    cache = cache_file(filename)
+
+    program = None
+    try:
+        program = read_program(read_file(cache), size, mtime)
+    except OSError:
+        pass  # no cache yet
+    except SerializationError:
+        pass  # a corrupt cache, rewritten below
+
+    if program is None:
+        program = Parser.term(read_file(filename))
+        try:
+            write_file(cache, write_program(program, size, mtime))
+        except OSError:
+            pass  # e.g. a read-only directory; caching is only an optimization
+    return program
 
 
 def main(argv):
@@ -29,8 +104,7 @@ def main(argv):
     except IndexError:
         print("Expected one file name argument to be passed, e.g. ./e2 program.e2")
         raise RuntimeError
-    program_contents = read_file(argv[1])
-    program = Parser.term(program_contents)
+    program = load_program(file)
 
     # set debug level
     debug_level = 0
@@ -40,8 +114,23 @@ def main(argv):
         # there may be a better way to do this but RPython apparently does not allow "'DEBUG' in os.environ"
         pass
 
+    # select the engine, e.g. ENGINE=bytecode; the closure engine is only available untranslated
+    engine = ""
+    try:
+        engine = os.environ['ENGINE']
+    except KeyError:
+        pass
+    if engine == "bytecode":
+        interpreter = BytecodeInterpreter(e2, debug_level)
+    elif engine == "stack":
+        interpreter = StackInterpreter(e2, debug_level)
+    elif engine == "closure" and not we_are_translated():
+        interpreter = ClosureInterpreter(e2, debug_level)
+    else:
+        interpreter = Interpreter(e2, debug_level)
+
     # run the program
-    Interpreter(e2, debug_level).interpret(program)
+    interpreter.interpret(program)
 
     return 0
 
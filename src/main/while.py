@@ -1,7 +1,9 @@
-from src.meta.e2 import e2
+from src.meta.e2 import load
 from src.meta.interpreter import Interpreter
 from src.meta.parser import Parser
 
+e2 = load()
+
 
 def main(argv):
     """Run an E2 while-loop as an example"""
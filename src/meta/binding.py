@@ -0,0 +1,100 @@
+from src.meta.printable import Printable
+from src.meta.term import VarTerm, ListPatternTerm, ListTerm, ApplTerm
+
+# The steps of a binding plan. Loads put a sub-term of an earlier register into the step's own register (and, for a
+# variable, into its slot); checks validate the term in a register as Context.bind does and load nothing.
+LOAD_ARGUMENT = 0  # source, index: the index-th argument of an application
+LOAD_ITEM = 1  # source, index: the index-th item of a list
+LOAD_TAIL = 2  # source, index: the list after its first index items
+CHECK_APPL = 3  # source, arity: an application with the given number of arguments
+CHECK_LIST = 4  # source, length: a list of the given length
+CHECK_LIST_PATTERN = 5  # source, length: a list of at least the given length
+
+NAMES = ["LOAD_ARGUMENT", "LOAD_ITEM", "LOAD_TAIL", "CHECK_APPL", "CHECK_LIST", "CHECK_LIST_PATTERN"]
+
+
+class BindingPlan(Printable):
+    """A pattern flattened into the steps binding its variables; see Context.bind_plan. Register 0 holds the bound term
+    and step i writes register i + 1, so binding is a single loop over the steps. Unchecked plans leave out the checks
+    and are only used for terms already known to match the pattern, e.g. by the rule selected with Module.find."""
+    _immutable_fields_ = ['slot', 'operations[*]', 'sources[*]', 'indices[*]', 'slots[*]']
+
+    def __init__(self, slot=-1):
+        self.slot = slot  # the slot of a pattern that is itself a variable
+        self.operations = []
+        self.sources = []
+        self.indices = []
+        self.slots = []
+
+    @staticmethod
+    def build(pattern, checked=True):
+        plan = BindingPlan(pattern.slot if isinstance(pattern, VarTerm) else -1)
+        plan.__add(pattern, 0, checked)
+        return plan
+
+    def __add(self, pattern, register, checked):
+        if isinstance(pattern, ApplTerm):
+            if checked:
+                self.__step(CHECK_APPL, register, len(pattern.args))
+            for i in range(len(pattern.args)):
+                self.__load(LOAD_ARGUMENT, register, i, pattern.args[i], checked)
+        elif isinstance(pattern, ListTerm):
+            if checked:
+                self.__step(CHECK_LIST, register, pattern.length())
+            for i in range(pattern.length()):
+                self.__load(LOAD_ITEM, register, i, pattern.get(i), checked)
+        elif isinstance(pattern, ListPatternTerm):
+            if checked:
+                self.__step(CHECK_LIST_PATTERN, register, len(pattern.vars))
+            for i in range(len(pattern.vars)):
+                self.__load(LOAD_ITEM, register, i, pattern.vars[i], checked)
+            self.__load(LOAD_TAIL, register, len(pattern.vars), pattern.rest, checked)
+
+    def __load(self, operation, source, index, pattern, checked):
+        """Load a sub-pattern's term only if something is bound or checked in it"""
+        if isinstance(pattern, VarTerm):
+            if pattern.slot >= 0:
+                self.__step(operation, source, index, pattern.slot)
+        elif isinstance(pattern, ApplTerm) or isinstance(pattern, ListTerm) or isinstance(pattern, ListPatternTerm):
+            length = len(self.operations)
+            register = self.__step(operation, source, index)
+            self.__add(pattern, register, checked)
+            if len(self.operations) == length + 1:
+                self.__remove_last()  # nothing to bind or check below this sub-pattern
+
+    def __step(self, operation, source, index, slot=-1):
+        self.operations.append(operation)
+        self.sources.append(source)
+        self.indices.append(index)
+        self.slots.append(slot)
+        return len(self.operations)
+
+    def __remove_last(self):
+        self.operations.pop()
+        self.sources.pop()
+        self.indices.pop()
+        self.slots.pop()
+
+    def number_of_registers(self):
+        return len(self.operations) + 1
+
+    def to_string(self):
+        lines = []
+        if self.slot >= 0:
+            lines.append("r0 -> slot %d" % self.slot)
+        for i in range(len(self.operations)):
+            line = "r%d = %s r%d %d" % (i + 1, NAMES[self.operations[i]], self.sources[i], self.indices[i])
+            if self.slots[i] >= 0:
+                line += " -> slot %d" % self.slots[i]
+            lines.append(line)
+        return "\n".join(lines)
+
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.__dict__ == other.__dict__
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, self.__class__):
+            return not self.__eq__(other)
+        return NotImplemented
@@ -0,0 +1,360 @@
+from src.meta.context import Context, ContextError
+from src.meta.dynsem import PatternMatchPremise, DynsemError, EqualityCheckPremise, AssignmentPremise, ReductionPremise, \
+    CasePremise
+from src.meta.interpreter import Interpreter
+from src.meta.printable import Printable
+from src.meta.term import ApplTerm, ListTerm, ListPatternTerm, MapReadTerm, MapWriteTerm, VarTerm
+
+# So that you can still run this module under standard CPython...
+try:
+    from rpython.rlib.jit import elidable, promote, unroll_safe
+    from rpython.rlib.objectmodel import compute_unique_id
+except ImportError:
+    def compute_unique_id(x):
+        return id(x)
+
+
+    def elidable(func):
+        return func
+
+
+    def promote(x):
+        return x
+
+
+    def unroll_safe(func):
+        return func
+
+# Opcodes; each is followed by the number of operands listed. Instructions operate on a stack of terms and on the
+# slots of the rule's context; constants are terms, premises are only referred to for their error messages.
+MATCH_APPL = 1  # constant: pop an application shaped like the constant and push its arguments, first on top
+MATCH_LIST = 2  # length: pop a list of the given length and push its items, first on top
+MATCH_LIST_PATTERN = 3  # length: pop a list and push the remaining items as a list and then the first length items
+BIND_SLOT = 4  # slot: pop a term into a slot
+POP = 5  # (none): pop a term that does not need binding
+LOAD_SLOT = 6  # slot: push a term from a slot
+LOAD_CONST = 7  # constant: push a constant term
+BUILD_APPL = 8  # constant: pop the arguments of the constant application and push a new application
+BUILD_LIST = 9  # length: pop the given number of items and push a new list
+REDUCE = 10  # (none): pop a term and push the result of interpreting it
+EQUALS = 11  # premise: pop two terms and fail with the premise if they are not equal
+FAIL = 12  # premise: fail with the premise
+CASE_JUMP = 13  # constant, target: if the top term does not match the constant, jump to target; otherwise pop it
+JUMP = 14  # target: jump to target
+CASE_FAIL = 15  # premise: fail with the case premise, none of its branches matched
+ENV_PUT = 16  # (none): pop a value and a key (checked by CHECK_KEY) and write the value to the environment
+ENV_GET = 17  # (none): pop a key and push its value from the environment
+RETURN = 18  # (none): pop the result of the rule
+CHECK_KEY = 19  # (none): fail unless the top term can be an environment key, before its value is reduced
+
+NAMES = ["", "MATCH_APPL", "MATCH_LIST", "MATCH_LIST_PATTERN", "BIND_SLOT", "POP", "LOAD_SLOT", "LOAD_CONST",
+         "BUILD_APPL", "BUILD_LIST", "REDUCE", "EQUALS", "FAIL", "CASE_JUMP", "JUMP", "CASE_FAIL", "ENV_PUT", "ENV_GET",
+         "RETURN", "CHECK_KEY"]
+OPERANDS = [0, 1, 1, 1, 1, 0, 1, 1, 1, 1, 0, 1, 1, 2, 1, 1, 0, 0, 0, 0]
+
+
+class Code(Printable):
+    """The compiled form of a rule: a flat list of instructions and the constants and premises they refer to"""
+    _immutable_fields_ = ['instructions[*]', 'constants[*]', 'premises[*]', 'number_of_slots']
+
+    def __init__(self, instructions, constants, premises, number_of_slots):
+        self.instructions = instructions
+        self.constants = constants  # terms only, e.g. matched by CASE_JUMP
+        self.premises = premises
+        self.number_of_slots = number_of_slots
+
+    def to_string(self):
+        lines = []
+        pc = 0
+        while pc < len(self.instructions):
+            opcode = self.instructions[pc]
+            operands = [str(o) for o in self.instructions[pc + 1:pc + 1 + OPERANDS[opcode]]]
+            lines.append("%d: %s %s" % (pc, NAMES[opcode], " ".join(operands)))
+            pc += 1 + OPERANDS[opcode]
+        return "\n".join(lines)
+
+
+class Compiler:
+    """Lower a rule into bytecode; binding a pattern becomes a sequence of MATCH_* and BIND_SLOT instructions, resolving
+    a term a sequence of LOAD_* and BUILD_* instructions, and premises are laid out one after the other"""
+
+    def __init__(self):
+        self.instructions = []
+        self.constants = []
+        self.premises = []
+
+    @staticmethod
+    def compile(rule):
+        compiler = Compiler()
+        compiler.compile_bind(rule.before)
+        for premise in rule.premises:
+            compiler.compile_premise(premise)
+        compiler.compile_after(rule.after)
+        return Code(compiler.instructions, compiler.constants, compiler.premises, rule.number_of_bound_terms)
+
+    def emit(self, opcode, *operands):
+        self.instructions.append(opcode)
+        for operand in operands:
+            self.instructions.append(operand)
+        return len(self.instructions) - len(operands)  # the location of the first operand, for patching
+
+    def constant(self, value):
+        for i in range(len(self.constants)):
+            if self.constants[i] is value:
+                return i
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def premise(self, premise):
+        self.premises.append(premise)
+        return len(self.premises) - 1
+
+    def compile_bind(self, pattern):
+        """Bind the term on the top of the stack to a pattern (see Context.bind)"""
+        if isinstance(pattern, VarTerm) and pattern.slot >= 0:
+            self.emit(BIND_SLOT, pattern.slot)
+        elif isinstance(pattern, ListTerm):
+            self.emit(MATCH_LIST, pattern.length())
+            for item in pattern.to_list():
+                self.compile_bind(item)
+        elif isinstance(pattern, ListPatternTerm):
+            self.emit(MATCH_LIST_PATTERN, len(pattern.vars))
+            for var in pattern.vars:
+                self.compile_bind(var)
+            self.compile_bind(pattern.rest)
+        elif isinstance(pattern, ApplTerm):
+            self.emit(MATCH_APPL, self.constant(pattern))
+            for arg in pattern.args:
+                self.compile_bind(arg)
+        else:
+            self.emit(POP)
+
+    def compile_resolve(self, term):
+        """Push the term resulting from resolving a term (see Context.resolve)"""
+        if isinstance(term, VarTerm) and term.slot >= 0:
+            self.emit(LOAD_SLOT, term.slot)
+        elif isinstance(term, ApplTerm) and not term.ground:
+            for arg in term.args:
+                self.compile_resolve(arg)
+            self.emit(BUILD_APPL, self.constant(term))
+        elif isinstance(term, ListTerm) and not term.ground:
+            for item in term.to_list():
+                self.compile_resolve(item)
+            self.emit(BUILD_LIST, term.length())
+        else:
+            self.emit(LOAD_CONST, self.constant(term))
+
+    def compile_premise(self, premise):
+        """See Interpreter.transform_premise"""
+        if isinstance(premise, PatternMatchPremise):
+            if premise.right.matches(premise.left):
+                self.emit(LOAD_CONST, self.constant(premise.right))
+                self.compile_bind(premise.left)
+            else:
+                self.emit(FAIL, self.premise(premise))
+        elif isinstance(premise, EqualityCheckPremise):
+            self.compile_resolve(premise.left)
+            self.compile_resolve(premise.right)
+            self.emit(EQUALS, self.premise(premise))
+        elif isinstance(premise, AssignmentPremise):
+            if isinstance(premise.left, VarTerm):
+                self.compile_resolve(premise.right)
+                self.compile_bind(premise.left)
+            else:
+                self.emit(FAIL, self.premise(premise))
+        elif isinstance(premise, ReductionPremise):
+            self.compile_resolve(premise.left)
+            self.emit(REDUCE)
+            self.compile_bind(premise.right)
+        elif isinstance(premise, CasePremise):
+            self.compile_resolve(premise.left)
+            jumps = []
+            for i in range(len(premise.values)):
+                if premise.values[i] is None:  # otherwise branch
+                    self.emit(POP)
+                    self.compile_premise(premise.premises[i])
+                    jumps.append(self.emit(JUMP, -1))
+                    break
+                next_case = self.emit(CASE_JUMP, self.constant(premise.values[i]), -1) + 1
+                self.compile_premise(premise.premises[i])
+                jumps.append(self.emit(JUMP, -1))
+                self.instructions[next_case] = len(self.instructions)
+            else:
+                self.emit(CASE_FAIL, self.premise(premise))
+            for jump in jumps:
+                self.instructions[jump] = len(self.instructions)
+        else:
+            raise NotImplementedError()
+
+    def compile_after(self, after):
+        """See Interpreter.transform_rule"""
+        if isinstance(after, MapWriteTerm):
+            for key in after.assignments:
+                value = after.assignments[key]
+                if isinstance(value, MapWriteTerm):
+                    continue
+                self.compile_resolve(key)
+                self.emit(CHECK_KEY)
+                self.compile_resolve(value)
+                self.emit(REDUCE)
+                self.emit(ENV_PUT)
+            self.compile_resolve(after)
+        elif isinstance(after, MapReadTerm):
+            self.compile_resolve(after.key)
+            self.emit(ENV_GET)
+        else:
+            self.compile_resolve(after)
+        self.emit(RETURN)
+
+
+class BytecodeInterpreter(Interpreter):
+    """An alternative engine for Interpreter that compiles each rule of the module to bytecode up front and executes
+    rules in a single dispatch loop instead of walking their premises and terms"""
+    _immutable_fields_ = ['module', 'debug', 'environment', 'terms', 'output', 'codes']
+
+    def __init__(self, dynsem_module, debug=0, terms=None, output=None):
+        Interpreter.__init__(self, dynsem_module, debug, terms, output)
+        self.codes = {}
+        for rule in dynsem_module.rules:
+            self.codes[compute_unique_id(rule)] = Compiler.compile(rule)
+
+    @elidable
+    def code_for(self, rule):
+        return self.codes[compute_unique_id(rule)]
+
+    def transform_rule(self, term, rule):
+        code = self.code_for(promote(rule))
+        return self.execute(code, term)
+
+    @unroll_safe
+    def execute(self, code, term):
+        code = promote(code)
+        context = Context(code.number_of_slots, self.terms)
+        stack = [term]
+        pc = 0
+        while True:
+            opcode = code.instructions[pc]
+            if opcode == MATCH_APPL:
+                pattern = code.constants[code.instructions[pc + 1]]
+                assert isinstance(pattern, ApplTerm)
+                term = stack.pop()
+                if not isinstance(term, ApplTerm):
+                    raise ContextError("Expected the term to both be an application but was: " + term.to_string())
+                if len(term.args) != len(pattern.args):
+                    raise ContextError("Expected the term and the pattern to have the same number of arguments")
+                self.push_reversed(stack, term.args)
+                pc += 2
+            elif opcode == MATCH_LIST:
+                term = stack.pop()
+                if not isinstance(term, ListTerm):
+                    raise ContextError("Expected the term to be a list but was: " + term.to_string())
+                if term.length() != code.instructions[pc + 1]:
+                    raise ContextError("Expected the term and the pattern to have the same number of items")
+                self.push_items(stack, term, term.length())
+                pc += 2
+            elif opcode == MATCH_LIST_PATTERN:
+                length = code.instructions[pc + 1]
+                term = stack.pop()
+                if not isinstance(term, ListTerm):
+                    raise ContextError("Expected the term to be a list but was: " + term.to_string())
+                stack.append(term.tail(length))
+                self.push_items(stack, term, length)
+                pc += 2
+            elif opcode == BIND_SLOT:
+                context.bound_terms[code.instructions[pc + 1]] = stack.pop()
+                pc += 2
+            elif opcode == POP:
+                stack.pop()
+                pc += 1
+            elif opcode == LOAD_SLOT:
+                bound = context.bound_terms[code.instructions[pc + 1]]
+                assert bound is not None
+                stack.append(bound)
+                pc += 2
+            elif opcode == LOAD_CONST:
+                stack.append(code.constants[code.instructions[pc + 1]])
+                pc += 2
+            elif opcode == BUILD_APPL:
+                template = code.constants[code.instructions[pc + 1]]
+                assert isinstance(template, ApplTerm)
+                stack.append(self.build_appl(template, stack))
+                pc += 2
+            elif opcode == BUILD_LIST:
+                stack.append(self.new_list(self.pop_many(stack, code.instructions[pc + 1])))
+                pc += 2
+            elif opcode == REDUCE:
+                stack.append(self.interpret(stack.pop()))
+                pc += 1
+            elif opcode == EQUALS:
+                right = stack.pop()
+                left = stack.pop()
+                if not left.equals(right):
+                    premise = code.premises[code.instructions[pc + 1]]
+                    raise DynsemError("Expected %s to equal %s" % (premise.left, premise.right))
+                pc += 2
+            elif opcode == FAIL:
+                premise = code.premises[code.instructions[pc + 1]]
+                if isinstance(premise, AssignmentPremise):
+                    raise DynsemError("Cannot assign to anything other than a variable (e.g. x => 2); TODO add " +
+                                      "support for constructor assignment (e.g. a(1, 2) => a(x, y))")
+                raise DynsemError("Expected %s to match %s" % (premise.left, premise.right))
+            elif opcode == CASE_JUMP:
+                if code.constants[code.instructions[pc + 1]].matches(stack[-1]):
+                    stack.pop()
+                    pc += 3
+                else:
+                    pc = code.instructions[pc + 2]
+            elif opcode == JUMP:
+                pc = code.instructions[pc + 1]
+            elif opcode == CASE_FAIL:
+                raise DynsemError("Unable to find matching branch in case statement: %s" %
+                                  code.premises[code.instructions[pc + 1]])
+            elif opcode == ENV_PUT:
+                value = stack.pop()
+                self.write_environment(stack.pop(), value)
+                pc += 1
+            elif opcode == CHECK_KEY:
+                self.check_environment_key(stack[-1])
+                pc += 1
+            elif opcode == ENV_GET:
+                stack.append(self.read_environment(stack.pop()))
+                pc += 1
+            elif opcode == RETURN:
+                result = stack.pop()
+                self.log("result", result)
+                return result
+            else:
+                raise NotImplementedError()
+
+    @unroll_safe
+    def push_reversed(self, stack, terms):
+        i = len(terms) - 1
+        while i >= 0:
+            stack.append(terms[i])
+            i -= 1
+
+    @unroll_safe
+    def push_items(self, stack, list_term, count):
+        i = count - 1
+        while i >= 0:
+            stack.append(list_term.get(i))
+            i -= 1
+
+    @unroll_safe
+    def pop_many(self, stack, count):
+        terms = [None] * count
+        i = count - 1
+        while i >= 0:
+            terms[i] = stack.pop()
+            i -= 1
+        return terms
+
+    @unroll_safe
+    def build_appl(self, template, stack):
+        args = self.pop_many(stack, len(template.args))
+        resolved_args = []
+        for arg in args:
+            if isinstance(arg, ListTerm) and arg.length() == 0:
+                continue  # see Context.__resolve_appl, empty lists are dropped from applications
+            resolved_args.append(arg)
+        return self.new_appl(template.name, resolved_args, template.symbol)
@@ -0,0 +1,240 @@
+from src.meta.context import Context, ContextError
+from src.meta.dynsem import PatternMatchPremise, DynsemError, EqualityCheckPremise, AssignmentPremise, ReductionPremise, \
+    CasePremise
+from src.meta.interpreter import Interpreter
+from src.meta.term import ApplTerm, ListTerm, ListPatternTerm, MapReadTerm, MapWriteTerm, VarTerm
+
+
+def compile_bind(pattern):
+    """Return a function binding the variables of the pattern to the slots of a context; see Context.bind"""
+    if isinstance(pattern, VarTerm) and pattern.slot >= 0:
+        slot = pattern.slot
+
+        def bind_var(slots, term):
+            slots[slot] = term
+
+        return bind_var
+    elif isinstance(pattern, ListTerm):
+        binders = [compile_bind(item) for item in pattern.to_list()]
+        length = len(binders)
+
+        def bind_list(slots, term):
+            if not isinstance(term, ListTerm):
+                raise ContextError("Expected the term to be a list but was: " + term.to_string())
+            if term.length() != length:
+                raise ContextError("Expected the term and the pattern to have the same number of items")
+            for i in range(length):
+                binders[i](slots, term.get(i))
+
+        return bind_list
+    elif isinstance(pattern, ListPatternTerm):
+        binders = [compile_bind(var) for var in pattern.vars]
+        bind_rest = compile_bind(pattern.rest)
+        length = len(binders)
+
+        def bind_list_pattern(slots, term):
+            if not isinstance(term, ListTerm):
+                raise ContextError("Expected the term to be a list but was: " + term.to_string())
+            for i in range(length):
+                binders[i](slots, term.get(i))
+            bind_rest(slots, term.tail(length))
+
+        return bind_list_pattern
+    elif isinstance(pattern, ApplTerm):
+        binders = [compile_bind(arg) for arg in pattern.args]
+        arity = len(binders)
+
+        def bind_appl(slots, term):
+            if not isinstance(term, ApplTerm):
+                raise ContextError("Expected the term to both be an application but was: " + term.to_string())
+            if len(term.args) != arity:
+                raise ContextError("Expected the term and the pattern to have the same number of arguments")
+            for i in range(arity):
+                binders[i](slots, term.args[i])
+
+        return bind_appl
+    else:
+        def bind_nothing(slots, term):
+            pass
+
+        return bind_nothing
+
+
+def compile_resolve(term, table=None):
+    """Return a function building the term from the slots of a context, interning the built terms if a TermTable is
+    passed; see Context.resolve"""
+    if isinstance(term, VarTerm) and term.slot >= 0:
+        slot = term.slot
+
+        def resolve_var(slots):
+            assert slots[slot] is not None
+            return slots[slot]
+
+        return resolve_var
+    elif isinstance(term, ApplTerm) and not term.ground:
+        name = term.name
+        symbol = term.symbol
+        resolvers = [compile_resolve(arg, table) for arg in term.args]
+
+        def resolve_appl(slots):
+            args = []
+            for resolver in resolvers:
+                arg = resolver(slots)
+                if isinstance(arg, ListTerm) and arg.length() == 0:
+                    continue  # see Context.__resolve_appl, empty lists are dropped from applications
+                args.append(arg)
+            return table.appl(name, args, symbol) if table is not None else ApplTerm(name, args, symbol)
+
+        return resolve_appl
+    elif isinstance(term, ListTerm) and not term.ground:
+        resolvers = [compile_resolve(item, table) for item in term.to_list()]
+
+        def resolve_list(slots):
+            items = [resolver(slots) for resolver in resolvers]
+            return table.list(items) if table is not None else ListTerm(items)
+
+        return resolve_list
+    else:
+        def resolve_constant(slots):
+            return term
+
+        return resolve_constant
+
+
+def compile_premise(premise, table=None):
+    """Return a function running the premise against an interpreter and the slots of a context; see
+    Interpreter.transform_premise"""
+    if isinstance(premise, PatternMatchPremise):
+        if premise.right.matches(premise.left):
+            bind = compile_bind(premise.left)
+            right = premise.right
+
+            def pattern_match(interpreter, slots):
+                bind(slots, right)
+
+            return pattern_match
+        else:
+            def pattern_mismatch(interpreter, slots):
+                raise DynsemError("Expected %s to match %s" % (premise.left, premise.right))
+
+            return pattern_mismatch
+    elif isinstance(premise, EqualityCheckPremise):
+        resolve_left = compile_resolve(premise.left, table)
+        resolve_right = compile_resolve(premise.right, table)
+
+        def equality_check(interpreter, slots):
+            if not resolve_left(slots).equals(resolve_right(slots)):
+                raise DynsemError("Expected %s to equal %s" % (premise.left, premise.right))
+
+        return equality_check
+    elif isinstance(premise, AssignmentPremise):
+        if isinstance(premise.left, VarTerm):
+            bind = compile_bind(premise.left)
+            resolve = compile_resolve(premise.right, table)
+
+            def assignment(interpreter, slots):
+                bind(slots, resolve(slots))
+
+            return assignment
+        else:
+            def invalid_assignment(interpreter, slots):
+                raise DynsemError("Cannot assign to anything other than a variable (e.g. x => 2); TODO add " +
+                                  "support for constructor assignment (e.g. a(1, 2) => a(x, y))")
+
+            return invalid_assignment
+    elif isinstance(premise, ReductionPremise):
+        resolve = compile_resolve(premise.left, table)
+        bind = compile_bind(premise.right)
+
+        def reduction(interpreter, slots):
+            bind(slots, interpreter.interpret(resolve(slots)))
+
+        return reduction
+    elif isinstance(premise, CasePremise):
+        resolve = compile_resolve(premise.left, table)
+        branches = [(value, compile_premise(subpremise, table))
+                    for value, subpremise in zip(premise.values, premise.premises)]
+
+        def case(interpreter, slots):
+            value = resolve(slots)
+            for pattern, run in branches:
+                if pattern is None or pattern.matches(value):  # None is the otherwise branch
+                    run(interpreter, slots)
+                    return
+            raise DynsemError("Unable to find matching branch in case statement: %s" % premise)
+
+        return case
+    else:
+        raise NotImplementedError()
+
+
+def compile_after(after, table=None):
+    """Return a function producing the result of a rule, including any environment changes; see
+    Interpreter.transform_rule"""
+    if isinstance(after, MapWriteTerm):
+        writes = []
+        for key in after.assignments:
+            value = after.assignments[key]
+            if not isinstance(value, MapWriteTerm):
+                writes.append((compile_resolve(key, table), compile_resolve(value, table)))
+
+        def environment_write(interpreter, slots):
+            for resolve_key, resolve_value in writes:
+                key = resolve_key(slots)
+                interpreter.check_environment_key(key)
+                interpreter.write_environment(key, interpreter.interpret(resolve_value(slots)))
+            return after
+
+        return environment_write
+    elif isinstance(after, MapReadTerm):
+        resolve_key = compile_resolve(after.key, table)
+
+        def environment_read(interpreter, slots):
+            return interpreter.read_environment(resolve_key(slots))
+
+        return environment_read
+    else:
+        resolve = compile_resolve(after, table)
+
+        def result(interpreter, slots):
+            return resolve(slots)
+
+        return result
+
+
+def compile_rule(rule, table=None):
+    """Return a function applying the rule to a term it matches"""
+    number_of_slots = rule.number_of_bound_terms
+    bind = compile_bind(rule.before)
+    premises = [compile_premise(premise, table) for premise in rule.premises]
+    after = compile_after(rule.after, table)
+
+    def apply(interpreter, term):
+        context = Context(number_of_slots, table)
+        slots = context.bound_terms
+        bind(slots, term)
+        interpreter.log("context", context)
+        for premise in premises:
+            premise(interpreter, slots)
+        return after(interpreter, slots)
+
+    return apply
+
+
+class ClosureInterpreter(Interpreter):
+    """An opt-in engine for running DynSem modules quickly under plain CPython (i.e. untranslated): when created, each
+    rule of the module is partially evaluated into a tree of closures with slot indices, names and premise kinds baked
+    in, so applying a rule is a series of direct calls instead of the isinstance dispatch done by Context and
+    Interpreter. RPython does not translate closures like these; use Interpreter or BytecodeInterpreter for translated
+    binaries."""
+
+    def __init__(self, dynsem_module, debug=0, terms=None, output=None):
+        Interpreter.__init__(self, dynsem_module, debug, terms, output)
+        self.compiled = {}
+        for rule in dynsem_module.rules:
+            self.compiled[id(rule)] = compile_rule(rule, terms)
+
+    def transform_rule(self, term, rule):
+        result = self.compiled[id(rule)](self, term)
+        self.log("result", result)
+        return result
@@ -1,3 +1,4 @@
+from src.meta.binding import LOAD_ARGUMENT, LOAD_ITEM, LOAD_TAIL, CHECK_APPL, CHECK_LIST, CHECK_LIST_PATTERN
 from src.meta.printable import Printable
 from src.meta.term import VarTerm, ListPatternTerm, ListTerm, ApplTerm
 
@@ -19,30 +20,31 @@ class ContextError(Exception):
 
 
 class Context(Printable):
-    _immutable_fields_ = ['bound_terms[*]']
+    _immutable_fields_ = ['bound_terms[*]', 'table']
 
-    def __init__(self, number_of_bound_terms):
+    def __init__(self, number_of_bound_terms, table=None):
         self.bound_terms = [None] * number_of_bound_terms
+        self.table = table  # if set, the TermTable used to intern resolved terms
 
     @unroll_safe
     def bind(self, pattern, term):
         """Bind the names free variables in a pattern to values in a term and save them in a context"""
         if isinstance(pattern, VarTerm):
-            self.bound_terms[pattern.slot] = term
+            if pattern.slot >= 0:  # variables never resolved afterwards have no slot; see SlotAssigner.assign_rule
+                self.bound_terms[pattern.slot] = term
         elif isinstance(pattern, ListTerm):
             if not isinstance(term, ListTerm):
                 raise ContextError("Expected the term to be a list but was: " + term.to_string())
-            if len(term.items) != len(pattern.items):
+            if term.length() != pattern.length():
                 raise ContextError("Expected the term and the pattern to have the same number of items")
-            for i in range(len(pattern.items)):
-                self.bind(pattern.items[i], term.items[i])
+            for i in range(pattern.length()):
+                self.bind(pattern.get(i), term.get(i))
         elif isinstance(pattern, ListPatternTerm):
             if not isinstance(term, ListTerm):
                 raise ContextError("Expected the term to be a list but was: " + term.to_string())
             for i in range(len(pattern.vars)):
-                self.bind(pattern.vars[i], term.items[i])
-            rest = term.items[len(pattern.vars):]
-            self.bind(pattern.rest, ListTerm(rest))
+                self.bind(pattern.vars[i], term.get(i))
+            self.bind(pattern.rest, term.tail(len(pattern.vars)))
         elif isinstance(pattern, ApplTerm):
             if not isinstance(term, ApplTerm):
                 raise ContextError("Expected the term to both be an application but was: " + term.to_string())
@@ -51,6 +53,49 @@ class Context(Printable):
             for i in range(len(term.args)):
                 self.bind(pattern.args[i], term.args[i])
 
+    @unroll_safe
+    def bind_plan(self, plan, term):
+        """Bind the variables of a pattern to values in a term following the pattern's BindingPlan: the same result as
+        bind but without recursing or dispatching on the pattern"""
+        if plan.slot >= 0:
+            self.bound_terms[plan.slot] = term
+        registers = [None] * plan.number_of_registers()
+        registers[0] = term
+        for i in range(len(plan.operations)):
+            operation = plan.operations[i]
+            source = registers[plan.sources[i]]
+            index = plan.indices[i]
+            if operation == LOAD_ARGUMENT:
+                assert isinstance(source, ApplTerm)
+                loaded = source.args[index]
+            elif operation == LOAD_ITEM:
+                assert isinstance(source, ListTerm)
+                loaded = source.get(index)
+            elif operation == LOAD_TAIL:
+                assert isinstance(source, ListTerm)
+                loaded = source.tail(index)
+            else:
+                self.__check(operation, source, index)
+                continue
+            registers[i + 1] = loaded
+            if plan.slots[i] >= 0:
+                self.bound_terms[plan.slots[i]] = loaded
+
+    @staticmethod
+    def __check(operation, term, size):
+        if operation == CHECK_APPL:
+            if not isinstance(term, ApplTerm):
+                raise ContextError("Expected the term to both be an application but was: " + term.to_string())
+            if len(term.args) != size:
+                raise ContextError("Expected the term and the pattern to have the same number of arguments")
+        else:
+            if not isinstance(term, ListTerm):
+                raise ContextError("Expected the term to be a list but was: " + term.to_string())
+            if operation == CHECK_LIST and term.length() != size:
+                raise ContextError("Expected the term and the pattern to have the same number of items")
+            if operation == CHECK_LIST_PATTERN and term.length() < size:
+                raise ContextError("Expected the term to have at least as many items as the pattern")
+
     @unroll_safe
     def resolve(self, term):
         """Using a context, resolve the names of free variables in a pattern to create a new term"""
@@ -58,8 +103,12 @@ class Context(Printable):
             assert self.bound_terms[term.slot] is not None
             return self.bound_terms[term.slot]
         elif isinstance(term, ApplTerm):
+            if term.ground:
+                return term
             return self.__resolve_appl(term)
         elif isinstance(term, ListTerm):
+            if term.ground:
+                return term
             return self.__resolve_list(term)
         else:
             return term
@@ -69,17 +118,21 @@ class Context(Printable):
         resolved_args = []
         for arg in term.args:
             resolved_arg = self.resolve(arg)
-            if isinstance(resolved_arg, ListTerm) and not resolved_arg.items:
+            if isinstance(resolved_arg, ListTerm) and resolved_arg.length() == 0:
                 continue  # special case for empty lists; TODO should we dispose of empty lists like this?
             else:
                 resolved_args.append(resolved_arg)
-        return ApplTerm(term.name, resolved_args)
+        if self.table is not None:
+            return self.table.appl(term.name, resolved_args, term.symbol)
+        return ApplTerm(term.name, resolved_args, term.symbol)
 
     @unroll_safe
     def __resolve_list(self, term):
         resolved_items = []
-        for i in range(len(term.items)):
-            resolved_items.append(self.resolve(term.items[i]))
+        for i in range(term.length()):
+            resolved_items.append(self.resolve(term.get(i)))
+        if self.table is not None:
+            return self.table.list(resolved_items)
         return ListTerm(resolved_items)
 
     def to_string(self):
@@ -0,0 +1,221 @@
+from src.meta.term import ApplTerm, IntTerm, ListTerm, ListPatternTerm, VarTerm
+
+# So that you can still run this module under standard CPython...
+try:
+    from rpython.rlib.jit import elidable, unroll_safe
+except ImportError:
+    def elidable(func):
+        return func
+
+
+    def unroll_safe(func):
+        return func
+
+
+# the kind of term a shape describes, in its low bits
+APPL_SHAPE = 0
+INT_SHAPE = 1
+LIST_SHAPE = 2
+SHAPE_KIND_BITS = 2
+ARITY_BITS = 24  # the arity of an application must fit in these bits
+NO_SHAPE = -1  # its low bits do not match any kind
+
+
+def shape_of(term):
+    """Describe the head of a term as an integer decision key: its constructor symbol and arity, integer value or list
+    length along with the kind of term; returns NO_SHAPE for terms that cannot be discriminated on (e.g. variables,
+    list patterns)"""
+    if isinstance(term, ApplTerm):
+        return (((term.symbol << ARITY_BITS) | len(term.args)) << SHAPE_KIND_BITS) | APPL_SHAPE
+    elif isinstance(term, IntTerm):
+        return (term.number << SHAPE_KIND_BITS) | INT_SHAPE
+    elif isinstance(term, ListTerm):
+        return (term.length() << SHAPE_KIND_BITS) | LIST_SHAPE
+    else:
+        return NO_SHAPE
+
+
+@unroll_safe
+def subterm_at(term, path):
+    """Follow a path of argument (or item) indices down into a term; the caller must have already checked the shape of
+    each term along the way"""
+    for index in path:
+        if isinstance(term, ApplTerm):
+            term = term.args[index]
+        else:
+            assert isinstance(term, ListTerm)
+            term = term.get(index)
+    return term
+
+
+class Check:
+    """A residual check that could not be decided by the tree, e.g. a list pattern's minimum length"""
+    _immutable_fields_ = ['path[*]', 'pattern']
+
+    def __init__(self, path, pattern):
+        self.path = path
+        self.pattern = pattern
+
+    def passes(self, term):
+        return self.pattern.matches(subterm_at(term, self.path))
+
+
+class Candidate:
+    _immutable_fields_ = ['transformation', 'checks[*]']
+
+    def __init__(self, transformation, checks):
+        self.transformation = transformation
+        self.checks = checks
+
+    @unroll_safe
+    def passes(self, term):
+        for check in self.checks:
+            if not check.passes(term):
+                return False
+        return True
+
+
+class Decision:
+    """A node in the decision tree"""
+    pass
+
+
+class Switch(Decision):
+    """Inspect the shape of the sub-term at a path and branch on it; terms with an unknown shape take the default"""
+    _immutable_fields_ = ['path[*]', 'branches', 'default']
+
+    def __init__(self, path, branches, default):
+        self.path = path
+        self.branches = branches
+        self.default = default
+
+
+class Leaf(Decision):
+    """The remaining candidates, in priority order; only residual checks remain to be done"""
+    _immutable_fields_ = ['candidates[*]']
+
+    def __init__(self, candidates):
+        self.candidates = candidates
+
+
+class Row:
+    """A transformation's remaining (path, pattern) constraints while the tree is being built"""
+
+    def __init__(self, transformation, constraints):
+        self.transformation = transformation
+        self.constraints = constraints
+
+    def find(self, path):
+        for constraint in self.constraints:
+            if constraint[0] == path:
+                return constraint
+        return None
+
+    def without(self, constraint, added=None):
+        constraints = [c for c in self.constraints if c is not constraint]
+        if added:
+            constraints.extend(added)
+        return Row(self.transformation, constraints)
+
+
+def constraints_of(path, pattern):
+    """Variables match anything so they impose no constraint"""
+    return [] if isinstance(pattern, VarTerm) else [(path, pattern)]
+
+
+def children_of(path, pattern):
+    """Once the shape of a pattern has been decided, its sub-patterns become constraints of their own"""
+    subpatterns = pattern.args if isinstance(pattern, ApplTerm) else pattern.to_list() if isinstance(pattern, ListTerm) \
+        else []
+    constraints = []
+    for i in range(len(subpatterns)):
+        constraints.extend(constraints_of(path + (i,), subpatterns[i]))
+    return constraints
+
+
+def satisfies(pattern, shape):
+    """Decide, for a pattern that cannot be switched on, whether it matches every term of a shape: True, False or None
+    (i.e. undecidable, keep as a residual check)"""
+    if isinstance(pattern, ListPatternTerm):
+        return shape != NO_SHAPE and shape & ((1 << SHAPE_KIND_BITS) - 1) == LIST_SHAPE and \
+            shape >> SHAPE_KIND_BITS >= len(pattern.vars)
+    return None
+
+
+class Dispatcher:
+    """Select the transformation for a term using a decision tree compiled from the transformations' patterns. Each
+    switch in the tree inspects a single position of the term and transformations sharing a position share the test,
+    so selection time is bounded by the depth of the patterns and not by the number of transformations. As with a
+    linear scan, earlier transformations have priority over later ones."""
+    _immutable_fields_ = ['root']
+
+    def __init__(self, transformations=None, decided=None):
+        """Optionally, a list of (path, shape) pairs already decided by the caller (e.g. by an index) can be passed so
+        that the tree does not re-test those positions; a NO_SHAPE shape means that the term at the path has none of the
+        shapes the caller indexed on"""
+        rows = []
+        for transformation in (transformations if transformations else []):
+            rows.append(Row(transformation, constraints_of((), transformation.before)))
+        for path, shape in (decided if decided else []):
+            rows = self.__specialize(rows, path, shape)
+        self.root = self.__build(rows)
+
+    @elidable
+    def find(self, term):
+        node = self.root
+        while isinstance(node, Switch):
+            shape = shape_of(subterm_at(term, node.path))
+            node = node.branches.get(shape, node.default) if shape != NO_SHAPE else node.default
+        assert isinstance(node, Leaf)
+        for candidate in node.candidates:
+            if candidate.passes(term):
+                return candidate.transformation
+        return None
+
+    def __build(self, rows):
+        path = self.__choose(rows)
+        if path is None:
+            return Leaf([Candidate(row.transformation, [Check(list(p), c) for p, c in row.constraints]) for row in rows])
+
+        shapes = []
+        for row in rows:
+            constraint = row.find(path)
+            if constraint and shape_of(constraint[1]) != NO_SHAPE and shape_of(constraint[1]) not in shapes:
+                shapes.append(shape_of(constraint[1]))
+
+        branches = {}
+        for shape in shapes:
+            branches[shape] = self.__build(self.__specialize(rows, path, shape))
+        default = self.__build(self.__specialize(rows, path, NO_SHAPE))
+        return Switch(list(path), branches, default)
+
+    @staticmethod
+    def __choose(rows):
+        """Switch on the first decidable position of the highest-priority row"""
+        for row in rows:
+            for path, pattern in row.constraints:
+                if shape_of(pattern) != NO_SHAPE:
+                    return path
+        return None
+
+    @staticmethod
+    def __specialize(rows, path, shape):
+        """Retain the rows that may still match once the term at path is known to have the given shape (NO_SHAPE for
+        any shape not switched on)"""
+        specialized = []
+        for row in rows:
+            constraint = row.find(path)
+            if constraint is None:
+                specialized.append(row)
+            elif shape_of(constraint[1]) != NO_SHAPE:
+                if shape_of(constraint[1]) == shape:
+                    specialized.append(row.without(constraint, children_of(path, constraint[1])))
+            elif shape == NO_SHAPE:
+                specialized.append(row)
+            else:
+                decided = satisfies(constraint[1], shape)
+                if decided is None:
+                    specialized.append(row)
+                elif decided:
+                    specialized.append(row.without(constraint))
+        return specialized
@@ -1,47 +1,133 @@
+from src.meta.binding import BindingPlan
+from src.meta.dispatch import Dispatcher, shape_of
 from src.meta.printable import Printable
+from src.meta.term import mark_ground, MapWriteTerm, MapReadTerm, VarTerm
 
 try:
-    from rpython.rlib.jit import hint
+    from rpython.rlib.jit import hint, elidable
 except ImportError:
     def hint(x, **kwds):
         return x
 
 
+    def elidable(func):
+        return func
+
+
 class DynsemError(Exception):
     def __init__(self, reason):
         self.reason = reason
 
 
 class ModuleBuilder:
+    """The parsed sections of a single DynSem specification file; see Parser.all and ModuleLoader, which links these
+    into a Module"""
+
     def __init__(self):
         self.name = ""
         self.imports = []
         self.sorts = []
-        self.constructors = []
-        self.arrows = []
-        self.components = []
-        self.native_functions = []
+        self.constructors = []  # Signatures
+        self.arrows = []  # (sort, sort) pairs
+        self.components = []  # (name, sort) pairs
+        self.native_functions = []  # Signatures
         self.rules = []
 
 
+class Signature(Printable):
+    """A declared constructor or native operator: its name and the sorts of its arguments and of its result"""
+
+    def __init__(self, name, argument_sorts, result_sort):
+        self.name = name
+        self.argument_sorts = argument_sorts
+        self.result_sort = result_sort
+
+    def arity(self):
+        return len(self.argument_sorts)
+
+    def to_string(self):
+        return "%s: %s -> %s" % (self.name, " * ".join([s.to_string() for s in self.argument_sorts]),
+                                 self.result_sort.to_string())
+
+
 class Module:
-    _immutable_fields_ = ['rules[*]', 'native_functions[*]', 'lookup']
+    _immutable_fields_ = ['rules[*]', 'native_functions[*]', 'index', 'environment_keys']
 
     def __init__(self, rules=None, native_functions=None):
         self.rules = rules if rules else []
         self.native_functions = native_functions if native_functions else []
-        self.lookup = {}
+        self.environment_keys = {}  # the argument positions used as environment keys, by constructor symbol
         for rule in self.rules:
-            self.__add(rule)
-        for native in self.native_functions:
-            self.__add(native)
-
-    def __add(self, transformation):
-        assert isinstance(transformation, Transformation)
-        if transformation.before.name in self.lookup:
-            self.lookup[transformation.before.name].append(transformation)
-        else:
-            self.lookup[transformation.before.name] = [transformation]
+            self.__prepare(rule)
+        self.index = {}
+        self.__index(self.rules + self.native_functions)
+
+    def __prepare(self, rule):
+        """Once its slots are assigned, flatten the patterns bound by the rule into BindingPlans and mark the ground
+        parts of the terms it resolves (see mark_ground); the before pattern of a rule found with find already matches
+        the term, so its plan needs no checks"""
+        rule.before_plan = BindingPlan.build(rule.before, False)
+        self.__find_environment_keys(rule)
+        mark_ground(rule.after)
+        premises = list(rule.premises)
+        while premises:
+            premise = premises.pop()
+            if isinstance(premise, ReductionPremise):
+                mark_ground(premise.left)
+                premise.plan = BindingPlan.build(premise.right)
+            elif isinstance(premise, PatternMatchPremise):
+                premise.plan = BindingPlan.build(premise.left)
+            elif isinstance(premise, AssignmentPremise):
+                mark_ground(premise.right)
+                premise.plan = BindingPlan.build(premise.left)
+            elif isinstance(premise, EqualityCheckPremise):
+                mark_ground(premise.left)
+                mark_ground(premise.right)
+            elif isinstance(premise, CasePremise):
+                mark_ground(premise.left)
+                premises.extend(premise.premises)
+
+    def __find_environment_keys(self, rule):
+        """Record the arguments of the rule's constructor that it uses directly as environment keys, e.g. the x of
+        assign(x, v) --> {x |--> v, E} and retrieve(x) --> E[x]; see Interpreter.locate_variables"""
+        keys = []
+        if isinstance(rule.after, MapWriteTerm):
+            for key in rule.after.assignments:
+                if not isinstance(rule.after.assignments[key], MapWriteTerm):
+                    keys.append(key)
+        elif isinstance(rule.after, MapReadTerm):
+            keys.append(rule.after.key)
+        for key in keys:
+            if not isinstance(key, VarTerm):
+                continue
+            for i in range(len(rule.before.args)):
+                arg = rule.before.args[i]
+                if isinstance(arg, VarTerm) and arg.symbol == key.symbol:
+                    positions = self.environment_keys.setdefault(rule.before.symbol, [])
+                    if i not in positions:
+                        positions.append(i)
+
+    def __index(self, transformations):
+        """Group the transformations by constructor name and arity; the decision tree of each group then switches on the
+        shapes of their arguments, starting at the first argument its highest-priority transformation discriminates on"""
+        grouped = {}
+        keys = []
+        for transformation in transformations:
+            key = shape_of(transformation.before)
+            if key not in grouped:
+                grouped[key] = []
+                keys.append(key)
+            grouped[key].append(transformation)
+        for key in keys:
+            self.index[key] = Dispatcher(grouped[key], [((), key)])
+
+    @elidable
+    def find(self, term):
+        """Find the first transformation matching a term"""
+        dispatcher = self.index.get(shape_of(term), None)
+        if dispatcher is None:
+            return None
+        return dispatcher.find(term)
 
 
 class Transformation(Printable):
@@ -66,7 +152,8 @@ class Transformation(Printable):
 
 
 class Rule(Transformation):
-    _immutable_fields_ = ['before', 'after', 'components[*]', 'premises[*]', 'number_of_bound_terms', 'has_loop']
+    _immutable_fields_ = ['before', 'after', 'components[*]', 'premises[*]', 'number_of_bound_terms', 'has_loop',
+                          'before_plan']
 
     def __init__(self, before, after, components=None, premises=None, number_of_bound_terms=0, has_loop=False):
         Transformation.__init__(self, before, number_of_bound_terms)
@@ -74,6 +161,7 @@ class Rule(Transformation):
         self.components = components if components else []
         self.premises = premises if premises else []
         self.has_loop = has_loop
+        self.before_plan = None  # set by Module
 
     def to_string(self):
         transform = "%s --> %s" % (self.before.to_string(), self.after.to_string())
@@ -86,12 +174,47 @@ class Rule(Transformation):
         return transform
 
 
-class NativeFunction(Transformation):
-    _immutable_fields_ = ['before', 'action', 'number_of_bound_terms']
+# The kinds of values native functions take and return
+INT_KIND = 0  # an IntTerm, passed to (or returned from) the action as a Python int
+TERM_KIND = 1  # any term, passed (or returned) as is
+VOID_KIND = 2  # results only: whatever the action returns is dropped and the native function reduces to 0
 
-    def __init__(self, before, action, number_of_bound_terms=2):
-        Transformation.__init__(self, before, number_of_bound_terms)
-        self.action = action
+MAXIMUM_NATIVE_ARITY = 4
+
+
+class NativeFunction(Transformation):
+    """A transformation implemented by a Python function, the action, called with the interpreter's Output and then
+    the interpreted arguments of the term. All arguments have the same kind: ints (the default) or terms; the result
+    is of that same kind or void. So that each call site has a single signature (RPython demands this), the action is
+    kept in the one attribute for its argument kind and arity, e.g. int_action2 for add(x, y); the others are None."""
+    _immutable_fields_ = ['before', 'number_of_bound_terms', 'arity', 'argument_kind', 'result_kind',
+                          'int_action0', 'int_action1', 'int_action2', 'int_action3', 'int_action4',
+                          'term_action0', 'term_action1', 'term_action2', 'term_action3', 'term_action4']
+
+    def __init__(self, before, action, argument_kind=INT_KIND, result_kind=INT_KIND):
+        arity = len(before.args)
+        if arity > MAXIMUM_NATIVE_ARITY:
+            raise DynsemError("Native functions can take at most %d arguments: %s" % (MAXIMUM_NATIVE_ARITY,
+                                                                                      before.to_string()))
+        if argument_kind != INT_KIND and argument_kind != TERM_KIND:
+            raise DynsemError("Expected the arguments of %s to be ints or terms" % before.to_string())
+        if result_kind != argument_kind and result_kind != VOID_KIND:
+            raise DynsemError("Expected the result of %s to be of the kind of its arguments or void" %
+                              before.to_string())
+        Transformation.__init__(self, before, arity)
+        self.arity = arity
+        self.argument_kind = argument_kind
+        self.result_kind = result_kind
+        self.int_action0 = action if argument_kind == INT_KIND and arity == 0 else None
+        self.int_action1 = action if argument_kind == INT_KIND and arity == 1 else None
+        self.int_action2 = action if argument_kind == INT_KIND and arity == 2 else None
+        self.int_action3 = action if argument_kind == INT_KIND and arity == 3 else None
+        self.int_action4 = action if argument_kind == INT_KIND and arity == 4 else None
+        self.term_action0 = action if argument_kind == TERM_KIND and arity == 0 else None
+        self.term_action1 = action if argument_kind == TERM_KIND and arity == 1 else None
+        self.term_action2 = action if argument_kind == TERM_KIND and arity == 2 else None
+        self.term_action3 = action if argument_kind == TERM_KIND and arity == 3 else None
+        self.term_action4 = action if argument_kind == TERM_KIND and arity == 4 else None
 
     def to_string(self):
         return "%s --> [native function]" % self.before.to_string()
@@ -119,10 +242,11 @@ class Premise(Printable):
 
 
 class PatternMatchPremise(Premise):
-    _immutable_fields_ = ['left', 'right']
+    _immutable_fields_ = ['left', 'right', 'plan']
 
     def __init__(self, left, right):
         Premise.__init__(self, left, right)
+        self.plan = None  # the BindingPlan of the left side; set by Module
 
     def to_string(self):
         return "%s %s %s" % (self.left.to_string(), "=>", self.right.to_string())
@@ -140,20 +264,22 @@ class EqualityCheckPremise(Premise):
 
 class AssignmentPremise(Premise):
     # TODO remove, same as pattern match
-    _immutable_fields_ = ['left', 'right']
+    _immutable_fields_ = ['left', 'right', 'plan']
 
     def __init__(self, left, right):
         Premise.__init__(self, left, right)
+        self.plan = None  # the BindingPlan of the left side; set by Module
 
     def to_string(self):
         return "%s %s %s" % (self.left.to_string(), "=>", self.right.to_string())
 
 
 class ReductionPremise(Premise):
-    _immutable_fields_ = ['left', 'right']
+    _immutable_fields_ = ['left', 'right', 'plan']
 
     def __init__(self, left, right):
         Premise.__init__(self, left, right)
+        self.plan = None  # the BindingPlan of the right side; set by Module
 
     def to_string(self):
         return "%s %s %s" % (self.left.to_string(), "-->", self.right.to_string())
@@ -1,35 +1,76 @@
-from src.meta.dynsem import Module, NativeFunction
+import os
+
+from src.meta.dynsem import Module, NativeFunction, INT_KIND, VOID_KIND
 from src.meta.parser import Parser
+from src.meta.serialization import MODULE_HEADER, SerializationError, content_hash, read_module, write_module, \
+    load_file, save_file
 
 # TODO not the most elegant but it's what we have to work with
-while_rule = Parser.rule("while(cond, then) --> while2(cond, value, then) where cond --> value")
-while_rule.has_loop = True
+while_rule = "while(cond, then) --> while2(cond, value, then) where cond --> value"
 
-rules = [
-    Parser.rule("block([x | xs]) --> block(xs) where x --> y"),
-    Parser.rule("E |- assign(x, v) --> {x |--> v, E}"),
-    Parser.rule("E |- retrieve(x) --> E[x]"),
+rule_sources = [
+    "block([x | xs]) --> block(xs) where x --> y",
+    "E |- assign(x, v) --> {x |--> v, E}",
+    "E |- retrieve(x) --> E[x]",
     # TODO rename this to something other than ifz... it is not an ifz
-    Parser.rule(
-        "ifz(cond, then, else) --> result where cond --> cond2; case cond2 of {0 => result => else otherwise => result => then}"),
+    "ifz(cond, then, else) --> result where cond --> cond2; case cond2 of {0 => result => else otherwise => result => then}",
     while_rule,
-    Parser.rule("while2(cond, 0, then) --> 0"),
-    Parser.rule("while2(cond, value, then) --> while(cond, then) where then --> ignored")
+    "while2(cond, 0, then) --> 0",
+    "while2(cond, value, then) --> while(cond, then) where then --> ignored"
 ]
 
 
-def write(s, unused):
-    print(s)
-    return 0
+def write(output, s):
+    output.write("%d\n" % s)
+    return 0  # void, but an int like the result of every other native taking ints
 
 
+# built once, up front, so that the snapshot can bind to them; see ModuleReader.read_module
 native_functions = [
-    NativeFunction(Parser.native_function("write(x)"), write),  # TODO rpython demands it
-    NativeFunction(Parser.native_function("add(x, y)"), lambda x, y: x + y),
-    NativeFunction(Parser.native_function("sub(x, y)"), lambda x, y: x - y),
-    NativeFunction(Parser.native_function("mul(x, y)"), lambda x, y: x * y),
-    NativeFunction(Parser.native_function("div(x, y)"), lambda x, y: x // y),
-    NativeFunction(Parser.native_function("leq(x, y)"), lambda x, y: int(x <= y))
+    NativeFunction(Parser.native_function("write(x)"), write, INT_KIND, VOID_KIND),
+    NativeFunction(Parser.native_function("add(x, y)"), lambda output, x, y: x + y),
+    NativeFunction(Parser.native_function("sub(x, y)"), lambda output, x, y: x - y),
+    NativeFunction(Parser.native_function("mul(x, y)"), lambda output, x, y: x * y),
+    NativeFunction(Parser.native_function("div(x, y)"), lambda output, x, y: x // y),
+    NativeFunction(Parser.native_function("leq(x, y)"), lambda output, x, y: int(x <= y))
 ]
 
-e2 = Module(rules, native_functions)
+# a snapshot of the built module so that processes do not have to parse the rules at every start
+snapshot = os.path.join(os.path.dirname(os.path.abspath(__file__)), "e2.dsc")
+
+
+def build():
+    """Parse the E2 module from its sources"""
+    rules = []
+    for source in rule_sources:
+        rule = Parser.rule(source)
+        rule.has_loop = source == while_rule
+        rules.append(rule)
+    return Module(rules, native_functions)
+
+
+def digest():
+    """Hash everything the module is built from, so that out-of-date snapshots are not loaded"""
+    parts = [MODULE_HEADER] + rule_sources
+    for native_function in native_functions:
+        parts.append("%s %d %d" % (native_function.before.to_string(), native_function.argument_kind,
+                                   native_function.result_kind))
+    return content_hash("\n".join(parts))
+
+
+def load(filename=snapshot):
+    """Load the E2 module from its snapshot, (re)building it and taking a new snapshot if that is out of date; reads
+    files with open(), so call it before translation (see src/main/e2.py), not from translated code"""
+    module = None
+    try:
+        module = read_module(load_file(filename), digest(), native_functions)
+    except (IOError, OSError, SerializationError):
+        pass
+
+    if module is None:
+        module = build()
+        try:
+            save_file(filename, write_module(module, digest()))
+        except (IOError, OSError):
+            pass  # e.g. a read-only installation; the snapshot is only an optimization
+    return module
@@ -1,8 +1,9 @@
 from src.meta.context import Context
 from src.meta.dynsem import PatternMatchPremise, DynsemError, EqualityCheckPremise, AssignmentPremise, ReductionPremise, \
-    CasePremise, Rule, NativeFunction
+    CasePremise, Rule, NativeFunction, INT_KIND, TERM_KIND
 from src.meta.list_backed_map import ListBackedMap
-from src.meta.term import ApplTerm, MapReadTerm, MapWriteTerm, VarTerm, IntTerm
+from src.meta.output import BufferedOutput
+from src.meta.term import ApplTerm, MapReadTerm, MapWriteTerm, VarTerm, IntTerm, ListTerm, int_term
 
 # So that you can still run this module under standard CPython...
 try:
@@ -54,13 +55,15 @@ class InterpreterError(Exception):
 
 
 class Interpreter:
-    _immutable_fields_ = ['module', 'debug', 'environment']
+    _immutable_fields_ = ['module', 'debug', 'environment', 'terms', 'output']
 
-    def __init__(self, dynsem_module, debug=0):
+    def __init__(self, dynsem_module, debug=0, terms=None, output=None):
         self.environment = ListBackedMap()
         self.module = dynsem_module
         self.debug = promote(debug)
         self.nesting = -1
+        self.terms = terms  # optionally, a TermTable for interning the terms built during interpretation
+        self.output = output if output is not None else BufferedOutput()  # program output, flushed by interpret
 
     @unroll_safe
     def log(self, label, printable=None):
@@ -71,11 +74,21 @@ class Interpreter:
             else:
                 print("%s%s" % (" " * self.nesting, label))
 
-    @unroll_safe
     def interpret(self, term):
-        if self.debug != 0:
-            self.nesting += 1
+        self.nesting += 1
+        try:
+            if self.nesting == 0:
+                self.locate_variables(term)  # only for the program, not the terms reduced while running it
+            return self.evaluate(term)
+        finally:
+            # also when a transformation fails, so that a later program's output is still flushed
+            self.nesting -= 1
+            if self.nesting < 0:
+                self.output.flush()  # only once the outermost interpret is done
 
+    @unroll_safe
+    def evaluate(self, term):
+        """Transform a term until no transformation applies; see interpret"""
         while term is not None and isinstance(term, ApplTerm):
             jitdriver.jit_merge_point(hashed_term=term.hash, interpreter=self, term=term)
             self.log("term", term)
@@ -101,28 +114,21 @@ class Interpreter:
                 term = self.transform_native_function(term, transformation)
             else:
                 raise NotImplementedError()
-
-        if self.debug != 0:
-            self.nesting -= 1
         return term
 
     @elidable
     def find_transformation(self, term):
         assert isinstance(term, ApplTerm)
-        found = self.module.lookup.get(term.name, [])
-        for transformation in found:
-            if transformation.matches(term):
-                return transformation
-        return None
+        return self.module.find(term)
 
     @unroll_safe
     def transform_rule(self, term, rule):
         rule = promote(rule)
-        context = Context(rule.number_of_bound_terms)
+        context = Context(rule.number_of_bound_terms, self.terms)
         # for component in rule.components:
         # context.bind(component, self.environment)
         # TODO re-enable when we can bind the environment name to the context
-        context.bind(rule.before, term)
+        context.bind_plan(rule.before_plan, term)
         self.log("context", context)
 
         # handle premises
@@ -138,31 +144,69 @@ class Interpreter:
                 if isinstance(value, MapWriteTerm):
                     continue
                 resolved_key = context.resolve(key)
-                if not isinstance(resolved_key, VarTerm):
-                    raise InterpreterError("Expected a VarTerm to use as the environment name but found: %s" %
-                                           resolved_key)
+                self.check_environment_key(resolved_key)
                 interpreted_value = self.interpret(context.resolve(value))
-                if resolved_key.index < 0:
-                    resolved_key.index = self.environment.locate(resolved_key.name)
-                self.environment.put(resolved_key.index, interpreted_value)
+                self.write_environment(resolved_key, interpreted_value)
         elif isinstance(rule.after, MapReadTerm):
             # TODO this relies on the same unchecked assumption as above
-            resolved_key = context.resolve(rule.after.key)
-            assert isinstance(resolved_key, VarTerm)
-            if resolved_key.index < 0:
-                resolved_key.index = self.environment.locate(resolved_key.name)
-            return self.environment.get(resolved_key.index)
+            return self.read_environment(context.resolve(rule.after.key))
         # TODO perhaps the Map*Terms should return not themselves but the saved/retrieved value
 
         result = context.resolve(rule.after)
         self.log("result", result)
         return result
 
+    def new_appl(self, name, args, symbol=-1):
+        return self.terms.appl(name, args, symbol) if self.terms is not None else ApplTerm(name, args, symbol)
+
+    def new_list(self, items):
+        return self.terms.list(items) if self.terms is not None else ListTerm(items)
+
+    def new_int(self, number):
+        return self.terms.integer(number) if self.terms is not None else int_term(number)
+
+    def locate_variables(self, program):
+        """Before running a program, assign the names it uses as environment keys (e.g. the a of assign(a, 1) and
+        retrieve(a), see Module.environment_keys) their index in the environment, sizing the environment once up front;
+        writing and reading the environment then only indexes a list. Indices are reassigned for every run since they
+        belong to this interpreter's environment."""
+        pending = [program]
+        while pending:
+            term = pending.pop()
+            if isinstance(term, ApplTerm):
+                positions = self.module.environment_keys.get(term.symbol, None)
+                if positions is not None:
+                    for position in positions:
+                        key = term.args[position] if position < len(term.args) else None
+                        if isinstance(key, VarTerm):
+                            key.index = self.environment.reserve_symbol(key.symbol)
+                pending.extend(term.args)
+            elif isinstance(term, ListTerm):
+                for i in range(term.length()):
+                    pending.append(term.get(i))
+        self.environment.fit()
+
+    def check_environment_key(self, key):
+        if not isinstance(key, VarTerm):
+            raise InterpreterError("Expected a VarTerm to use as the environment name but found: %s" % key)
+
+    def write_environment(self, key, value):
+        assert isinstance(key, VarTerm)
+        if key.index < 0:  # only for keys that are not part of the program, see locate_variables
+            key.index = self.environment.locate_symbol(key.symbol)
+        self.environment.put(key.index, value)
+
+    def read_environment(self, key):
+        assert isinstance(key, VarTerm)
+        if key.index < 0:
+            key.index = self.environment.locate_symbol(key.symbol)
+        return self.environment.get(key.index)
+
     @unroll_safe
     def transform_premise(self, premise, context):
         if isinstance(premise, PatternMatchPremise):
             if premise.right.matches(premise.left):
-                context.bind(premise.left, premise.right)  # TODO seems like it should be context.resolve(premise.right)
+                context.bind_plan(premise.plan, premise.right)  # TODO seems like it should be context.resolve(premise.right)
             else:
                 raise DynsemError("Expected %s to match %s" % (premise.left, premise.right))
         elif isinstance(premise, EqualityCheckPremise):
@@ -173,52 +217,83 @@ class Interpreter:
                 raise DynsemError("Expected %s to equal %s" % (premise.left, premise.right))
         elif isinstance(premise, AssignmentPremise):
             if isinstance(premise.left, VarTerm):
-                context.bind(premise.left, context.resolve(premise.right))
+                context.bind_plan(premise.plan, context.resolve(premise.right))
             else:
                 raise DynsemError("Cannot assign to anything other than a variable (e.g. x => 2); TODO add " +
                                   "support for constructor assignment (e.g. a(1, 2) => a(x, y))")
         elif isinstance(premise, ReductionPremise):
             intermediate_term = context.resolve(premise.left)
             new_term = self.interpret(intermediate_term)
-            context.bind(premise.right, new_term)
+            context.bind_plan(premise.plan, new_term)
         elif isinstance(premise, CasePremise):
-            value = context.resolve(premise.left)
-            found = None
-            for i in range(len(premise.values)):
-                if premise.values[i] is None:  # otherwise branch
-                    found = premise.premises[i]
-                    break
-                elif premise.values[i].matches(value):
-                    found = premise.premises[i]
-                    break
-            if found:
-                self.transform_premise(found, context)
-            else:
-                raise DynsemError("Unable to find matching branch in case statement: %s" % str(self))
+            self.transform_premise(self.select_case(premise, context), context)
         else:
             raise NotImplementedError()
 
     @unroll_safe
+    def select_case(self, premise, context):
+        value = context.resolve(premise.left)
+        for i in range(len(premise.values)):
+            if premise.values[i] is None:  # otherwise branch
+                return premise.premises[i]
+            elif premise.values[i].matches(value):
+                return premise.premises[i]
+        raise DynsemError("Unable to find matching branch in case statement: %s" % str(self))
+
     def transform_native_function(self, term, native_function):
-        context = Context(native_function.number_of_bound_terms)
-        context.bind(native_function.before, term)
-        self.log("context", context)
+        native_function = promote(native_function)
+        arity = native_function.arity
+        if native_function.argument_kind == INT_KIND:
+            i0 = self.int_argument(native_function, term.args[0], self.interpret(term.args[0])) if arity > 0 else 0
+            i1 = self.int_argument(native_function, term.args[1], self.interpret(term.args[1])) if arity > 1 else 0
+            i2 = self.int_argument(native_function, term.args[2], self.interpret(term.args[2])) if arity > 2 else 0
+            i3 = self.int_argument(native_function, term.args[3], self.interpret(term.args[3])) if arity > 3 else 0
+            return self.call_int_native(native_function, i0, i1, i2, i3)
+        t0 = self.interpret(term.args[0]) if arity > 0 else None
+        t1 = self.interpret(term.args[1]) if arity > 1 else None
+        t2 = self.interpret(term.args[2]) if arity > 2 else None
+        t3 = self.interpret(term.args[3]) if arity > 3 else None
+        return self.call_term_native(native_function, t0, t1, t2, t3)
+
+    def int_argument(self, native_function, argument, interpreted):
+        """Unbox an interpreted argument of a native function taking ints"""
+        if not isinstance(interpreted, IntTerm):
+            raise InterpreterError("Expected parameter %s of %s to resolve to an IntTerm but was: %s" %
+                                   (argument, native_function, interpreted))
+        return interpreted.number
+
+    def call_int_native(self, native_function, a0, a1, a2, a3):
+        """Call the action of a native function taking ints with exactly as many arguments as it declares"""
+        arity = native_function.arity
+        output = self.output
+        if arity == 0:
+            value = native_function.int_action0(output)
+        elif arity == 1:
+            value = native_function.int_action1(output, a0)
+        elif arity == 2:
+            value = native_function.int_action2(output, a0, a1)
+        elif arity == 3:
+            value = native_function.int_action3(output, a0, a1, a2)
+        else:
+            value = native_function.int_action4(output, a0, a1, a2, a3)
+        result = self.new_int(value if native_function.result_kind == INT_KIND else 0)
+        self.log("result", result)
+        return result
 
-        args = []
-        for arg in native_function.before.args:
-            resolved = context.resolve(arg)
-            interpreted = self.interpret(
-                resolved)  # TODO need to determine what type of term to use, not hard-code this
-            if not isinstance(interpreted, IntTerm):
-                raise InterpreterError("Expected parameter %s of %s to resolve to an IntTerm but was: %s" %
-                                       (resolved, native_function, interpreted))
-            args.append(interpreted.number)
-
-        if len(args) < 2:
-            args.append(0)
-        tuple_args = (args[0], args[1])  # TODO RPython demands this
-
-        result = IntTerm(
-            native_function.action(*tuple_args))  # TODO need to determine what type of term to use, not hard-code this
+    def call_term_native(self, native_function, a0, a1, a2, a3):
+        """Call the action of a native function taking terms with exactly as many arguments as it declares"""
+        arity = native_function.arity
+        output = self.output
+        if arity == 0:
+            value = native_function.term_action0(output)
+        elif arity == 1:
+            value = native_function.term_action1(output, a0)
+        elif arity == 2:
+            value = native_function.term_action2(output, a0, a1)
+        elif arity == 3:
+            value = native_function.term_action3(output, a0, a1, a2)
+        else:
+            value = native_function.term_action4(output, a0, a1, a2, a3)
+        result = value if native_function.result_kind == TERM_KIND else self.new_int(0)
         self.log("result", result)
         return result
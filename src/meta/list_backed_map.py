@@ -1,6 +1,8 @@
+from src.meta.symbols import symbols
+
 # So that you can still run this module under standard CPython...
 try:
-    from rpython.rlib.jit import unroll_safe, hint, elidable
+    from rpython.rlib.jit import unroll_safe, hint, elidable, promote
 except ImportError:
     def hint(x, **kwds):
         return x
@@ -14,19 +16,77 @@ except ImportError:
         return func
 
 
+    def promote(x):
+        return x
+
+
+class Shape:
+    """The layout of a ListBackedMap: which names it holds and at which index, as in PyPy's maps. A shape never changes;
+    adding a name transitions to a child shape, created once and shared by every map taking the same transition, so
+    finding an index is a pure function of the shape and the name that the JIT can constant-fold once the shape is
+    promoted."""
+    _immutable_fields_ = ['parent', 'symbol', 'index', 'size', 'indices']
+
+    def __init__(self, parent=None, symbol=-1):
+        self.parent = parent
+        self.symbol = symbol  # the name added by the transition from the parent
+        self.index = parent.size if parent is not None else -1
+        self.size = self.index + 1 if parent is not None else 0
+        self.indices = {}  # the index of every name the shape holds, by symbol; never modified once built
+        if parent is not None:
+            self.indices.update(parent.indices)
+            self.indices[symbol] = self.index
+        self.transitions = {}  # the child shapes already created, by symbol; a cache, not part of the layout
+
+    @elidable
+    def find(self, symbol):
+        """The index of a name or -1 if the shape does not hold it"""
+        return self.indices.get(symbol, -1)
+
+    @elidable
+    def add(self, symbol):
+        """The shape holding one more name, at the next index"""
+        child = self.transitions.get(symbol, None)
+        if child is None:
+            child = Shape(self, symbol)
+            self.transitions[symbol] = child
+        return child
+
+
+EMPTY_SHAPE = Shape()
+
+
 class ListBackedMap:
+    """The environment: a list of values laid out by the map's current Shape. Locating a new name grows the map by a
+    shape transition; the indices of names already located never change."""
+
     def __init__(self):
-        self.names = {}
+        self.shape = EMPTY_SHAPE
         self.values = []
 
-    @elidable
     def locate(self, name):
-        if name not in self.names:
-            index = len(self.names)
-            self.names[name] = index
-            if index >= len(self.values):
-                self.values.append(None)
-        return self.names[name]
+        return self.locate_symbol(symbols.intern(name))
+
+    def locate_symbol(self, symbol):
+        index = self.reserve_symbol(symbol)
+        self.fit()
+        return index
+
+    def reserve_symbol(self, symbol):
+        """Locate a name without growing the values; call fit() once every name is reserved"""
+        shape = promote(self.shape)
+        index = shape.find(symbol)
+        if index < 0:
+            shape = shape.add(symbol)
+            self.shape = shape
+            index = shape.index
+        return index
+
+    def fit(self):
+        """Size the values to hold every name located so far, in a single allocation"""
+        missing = self.shape.size - len(self.values)
+        if missing > 0:
+            self.values.extend([None] * missing)
 
     @unroll_safe
     def get(self, index):
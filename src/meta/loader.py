@@ -0,0 +1,91 @@
+import os
+
+from src.meta.dynsem import Module, DynsemError
+from src.meta.parser import Parser
+
+
+class ModuleLoader:
+    """Load DynSem specification files (.ds) into a single Module. Imports (e.g. trans/runtime/values) are resolved to
+    files (trans/runtime/values.ds) in the importing file's directory or in one of the search paths; each file is
+    parsed once, however often it is imported. Native operators declared in a signature are bound by name to one of
+    the given NativeFunctions."""
+
+    def __init__(self, paths=None, native_functions=None):
+        self.paths = paths if paths else []
+        self.native_functions = native_functions if native_functions else []
+        self.parsed = {}  # the ModuleBuilder parsed from each file, by absolute path
+
+    def load(self, filename):
+        return self.link(self.collect(filename))
+
+    def parse(self, filename):
+        path = os.path.abspath(filename)
+        if path not in self.parsed:
+            with open(path) as file:
+                self.parsed[path] = Parser(file.read(), path).all()
+        return self.parsed[path]
+
+    def resolve(self, name, importer):
+        """Find the file of an imported module"""
+        for directory in [os.path.dirname(importer)] + self.paths:
+            candidate = os.path.join(directory, name + ".ds")
+            if os.path.isfile(candidate):
+                return os.path.abspath(candidate)
+        raise DynsemError("Unable to find module %s imported by %s" % (name, importer))
+
+    def collect(self, filename):
+        """Parse a file and, transitively, everything it imports; returns the ModuleBuilders with each file before its
+        imports and every file only once (imports may be cyclic)"""
+        builders = []
+        seen = {}
+        pending = [os.path.abspath(filename)]
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+            seen[path] = True
+            builder = self.parse(path)
+            builders.append(builder)
+            for i in range(len(builder.imports) - 1, -1, -1):
+                pending.append(self.resolve(builder.imports[i], path))
+        return builders
+
+    def link(self, builders):
+        """Combine the rules and signatures of the modules into one Module; the rules of earlier modules have priority
+        over those of the modules they import"""
+        arities = {}
+        for builder in builders:
+            for constructor in builder.constructors + builder.native_functions:
+                self.__declare(arities, constructor.name, constructor.arity())
+
+        rules = []
+        for builder in builders:
+            for rule in builder.rules:
+                self.__check(arities, rule.before)
+                rules.append(rule)
+
+        available = {}
+        for native_function in self.native_functions:
+            available[native_function.before.name] = native_function
+        native_functions = []
+        for builder in builders:
+            for signature in builder.native_functions:
+                if signature.name not in available:
+                    raise DynsemError("No implementation for native operator %s" % signature.to_string())
+                native_function = available[signature.name]
+                self.__check(arities, native_function.before)
+                native_functions.append(native_function)
+
+        return Module(rules, native_functions)
+
+    @staticmethod
+    def __declare(arities, name, arity):
+        if name in arities and arities[name] != arity:
+            raise DynsemError("Constructor %s is declared with both %d and %d arguments" % (name, arities[name], arity))
+        arities[name] = arity
+
+    @staticmethod
+    def __check(arities, before):
+        """Transformations of declared constructors must match the declared arity"""
+        if before.name in arities and arities[before.name] != len(before.args):
+            raise DynsemError("Expected %s to have %d arguments as declared" % (before.to_string(), arities[before.name]))
@@ -0,0 +1,53 @@
+import os
+
+
+class Output:
+    """Where programs write their output to, e.g. using E2's write native; every NativeFunction action is passed one"""
+
+    def write(self, text):
+        raise NotImplementedError()
+
+    def flush(self):
+        pass
+
+
+class BufferedOutput(Output):
+    """Collect output in blocks of at least block_size characters and write each block with a single call to the
+    file descriptor; the interpreter flushes any partial block when it finishes"""
+
+    def __init__(self, fd=1, block_size=8192):
+        self.fd = fd
+        self.block_size = block_size
+        self.pending = []
+        self.size = 0
+
+    def write(self, text):
+        self.pending.append(text)
+        self.size += len(text)
+        if self.size >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if self.size == 0:
+            return
+        data = "".join(self.pending)
+        self.pending = []
+        self.size = 0
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")  # only under Python 3, where str is not bytes
+        while len(data) > 0:
+            written = os.write(self.fd, data)
+            data = data[written:]
+
+
+class MemoryOutput(Output):
+    """Keep all output in memory, e.g. for tests"""
+
+    def __init__(self):
+        self.pending = []
+
+    def write(self, text):
+        self.pending.append(text)
+
+    def value(self):
+        return "".join(self.pending)
@@ -5,18 +5,27 @@ from src.meta.tokenizer import *
 
 
 class ParseError(Exception):
-    def __init__(self, reason, token):
+    def __init__(self, reason, token, location=None):
         self.reason = reason
         self.token = token
+        self.location = location
 
     def __str__(self):
-        return self.reason + " at token " + str(self.token)
+        return self.reason + " at token " + str(self.token) + (" (%s)" % self.location if self.location else "")
+
+
+class OpenTerm:
+    """An application (or a list, without a name) whose arguments are still being parsed"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = []
 
 
 class Parser:
-    def __init__(self, text):
-        self.tokenizer = Tokenizer(text)
-        self.module = Module()
+    def __init__(self, text, file=None):
+        self.tokens = TokenStream(text, file)
+        self.module = ModuleBuilder()
 
     @staticmethod
     def term(text):
@@ -28,9 +37,7 @@ class Parser:
     def native_function(text):
         """Helper method for parsing a single term; has slot assignment for native contexts"""
         term = Parser(text).__parse_term()
-        assigned = SlotAssigner().assign_term(term)
-        if assigned != 2:
-            print("Expected native function to have two terms assigned: " + term.to_string())
+        SlotAssigner().assign_term(term)
         return term
 
     @staticmethod
@@ -45,104 +52,209 @@ class Parser:
         return Parser(text).__parse_premise()
 
     def next(self):
-        """Parse one token and update the Module"""
-        token = self.tokenizer.next()
-        if isinstance(token, KeywordToken):
-            keyword = token.value
+        """Parse one section (or sub-section of the signature) and update the ModuleBuilder"""
+        kind = self.tokens.kind()
+        if kind == KEYWORD_KIND:
+            keyword = self.tokens.value()
+            self.tokens.advance()
             if keyword == "module":
-                self.module.name = self.__expect(IdToken).value
+                self.module.name = self.__expect(ID_KIND)
             elif keyword == "imports":
-                self.module.imports = [t.value for t in self.__collect(IdToken)]
+                self.module.imports.extend(self.__collect(ID_KIND))
+            elif keyword == "signature":
+                pass  # only contains the sub-sections below
+            elif keyword == "constructors":
+                while not self.__at_section_end():
+                    self.module.constructors.append(self.__parse_signature())
+            elif keyword == "native":
+                self.__possible_value(ID_KIND, "operators")  # e.g. native operators
+                while not self.__at_section_end():
+                    self.module.native_functions.append(self.__parse_signature())
+            elif keyword == "arrows":
+                while not self.__at_section_end():
+                    self.module.arrows.append(self.__parse_arrow())
+            elif keyword == "components":
+                while not self.__at_section_end():
+                    name = self.__expect(ID_KIND)
+                    self.__expect_value(OPERATOR_KIND, ":")
+                    self.module.components.append((name, self.__expect_term()))
             elif keyword == "rules":
-                while True:
-                    if self.__possible(KeywordToken) or self.__possible(EofToken):
-                        break
+                while not self.__at_section_end():
                     rule = self.__parse_rule()
                     self.module.rules.append(rule)
+            else:
+                raise self.__error("Unexpected keyword: " + keyword)
+            return self.module
+        elif self.__at_sorts():
+            self.tokens.advance()
+            while self.tokens.kind() == ID_KIND and not self.__at_section_end():
+                self.module.sorts.append(self.__expect(ID_KIND))
             return self.module
-        elif isinstance(token, EofToken):
+        elif self.__at_sort_aliases():
+            self.tokens.advance()
+            self.tokens.advance()
+            while not self.__at_section_end():
+                self.module.sorts.append(self.__expect(ID_KIND))
+                self.__expect_value(OPERATOR_KIND, "=")
+                self.__expect_term()  # aliases are only recorded as sorts
+            return self.module
+        elif kind == EOF_KIND:
             return None
         else:
-            raise ParseError("Unexpected token", token)
+            raise self.__error("Unexpected token")
 
     def all(self):
-        """Parse all tokens into a Module and return it"""
+        """Parse all tokens into a ModuleBuilder and return it"""
         while True:
             last = self.next()
             if last is None:
                 break
         return self.module
 
-    def __collect(self, token_type):
-        tokens = []
-        while True:
-            token = self.tokenizer.next()
-            if not isinstance(token, token_type):
-                self.tokenizer.undo(token)
-                break
-            tokens.append(token)
-        return tokens
-
-    def __expect(self, token_type):
-        token = self.tokenizer.next()
-        if not isinstance(token, token_type):
-            raise ParseError("Expected a token of %s but found something else" % token_type, token)
-        return token
-
-    def __expect_value(self, token_type, expected=None):
-        token = self.__expect(token_type)
-        if expected and token.value != expected:
-            raise ParseError("Expected a token with value %s but found something else" % str(expected), token)
-
-    def __possible(self, token_type):
-        token = self.tokenizer.next()
-        if isinstance(token, token_type):
-            return token
+    def __error(self, reason):
+        """Create a ParseError at the current token, creating the token and resolving its location only now that they
+        are needed"""
+        return ParseError(reason, self.tokens.token(), self.tokens.location())
+
+    def __at_section_end(self):
+        """Sections end at the next section keyword; "sorts" and "sort aliases" are not keywords but also start one"""
+        kind = self.tokens.kind()
+        return kind == KEYWORD_KIND or kind == EOF_KIND or self.__at_sorts() or self.__at_sort_aliases()
+
+    def __at_sorts(self):
+        """A "sorts" header, rather than e.g. a constructor named sorts in sorts(xs) --> xs"""
+        return self.tokens.kind() == ID_KIND and self.tokens.value_is("sorts") and \
+            self.tokens.kind(1) != LEFT_PARENS_KIND and not self.tokens.value_is(":", 1)
+
+    def __at_sort_aliases(self):
+        return self.tokens.kind() == ID_KIND and self.tokens.value_is("sort") and self.tokens.value_is("aliases", 1)
+
+    def __parse_signature(self):
+        """Parse e.g. Plus: Expr * Expr -> Expr, or a constant such as Nil: List"""
+        name = self.__expect(ID_KIND)
+        self.__expect_value(OPERATOR_KIND, ":")
+        sorts = []
+        if not (self.tokens.kind() == OPERATOR_KIND and self.tokens.value_is("->")):
+            sorts.append(self.__expect_term())
+            while self.__possible_value(OPERATOR_KIND, "*"):
+                sorts.append(self.__expect_term())
+        if self.__possible_value(OPERATOR_KIND, "->"):
+            return Signature(name, sorts, self.__expect_term())
+        elif len(sorts) == 1:
+            return Signature(name, [], sorts[0])
         else:
-            self.tokenizer.undo(token)
-            return None
+            raise self.__error("Expected -> and the sort of the result")
+
+    def __parse_arrow(self):
+        """Parse e.g. Expr --> V, ignoring any semantic components (E |- Expr --> V)"""
+        before = self.__expect_term()
+        if self.__possible_value(OPERATOR_KIND, "|-"):
+            before = self.__expect_term()
+        self.__expect_value(OPERATOR_KIND, "-->")
+        return before, self.__expect_term()
 
-    def __possible_value(self, token_type, expected):
-        token = self.tokenizer.next()
-        if isinstance(token, token_type) and expected and token.value == expected:
-            return token
+    def __collect(self, kind):
+        values = []
+        while self.tokens.kind() == kind:
+            values.append(self.tokens.value())
+            self.tokens.advance()
+        return values
+
+    def __expect(self, kind):
+        """Consume a token of the kind and return its value (if it has one)"""
+        if self.tokens.kind() != kind:
+            raise self.__error("Expected a token of %s but found something else" % KIND_NAMES[kind])
+        value = self.tokens.value()
+        self.tokens.advance()
+        return value
+
+    def __expect_value(self, kind, expected=None):
+        if expected and self.tokens.kind() == kind and not self.tokens.value_is(expected):
+            raise self.__error("Expected a token with value %s but found something else" % str(expected))
+        self.__expect(kind)
+
+    def __possible(self, kind):
+        if self.tokens.kind() == kind:
+            self.tokens.advance()
+            return True
         else:
-            self.tokenizer.undo(token)
-            return None
+            return False
 
-    def __parse_term(self):
-        token = self.tokenizer.next()
-        if isinstance(token, IdToken):
-            return self.__parse_identifier(token)
-        elif isinstance(token, NumberToken):
-            return IntTerm(0 if token.value is None else int(token.value))
-        elif isinstance(token, LeftBraceToken):
-            return self.__parse_new_environment(token)
-        elif isinstance(token, LeftBracketToken):
-            return self.__parse_list(token)
+    def __possible_value(self, kind, expected):
+        if self.tokens.kind() == kind and expected and self.tokens.value_is(expected):
+            self.tokens.advance()
+            return True
         else:
-            self.tokenizer.undo(token)
-            return None
+            return False
+
+    def __parse_term(self):
+        """Parse a term, deciding what to parse from the kind of the next token only, or return None if that token
+        cannot start a term. Applications and lists still waiting on their arguments are kept on an explicit stack
+        rather than parsed recursively so that deeply nested terms parse in linear time and constant Python stack."""
+        open_terms = []
+        while True:
+            kind = self.tokens.kind()
+            if kind == ID_KIND:
+                name = self.__expect(ID_KIND)
+                if self.__possible(LEFT_PARENS_KIND):
+                    open_terms.append(OpenTerm(name))
+                    continue
+                term = self.__parse_variable(name)
+            elif kind == NUMBER_KIND:
+                term = int_term(int(self.__expect(NUMBER_KIND)))
+            elif kind == LEFT_BRACE_KIND:
+                self.tokens.advance()
+                term = self.__parse_new_environment()
+            elif kind == LEFT_BRACKET_KIND:
+                self.tokens.advance()
+                open_terms.append(OpenTerm(None))
+                continue
+            elif not open_terms:
+                return None
+            else:
+                term = self.__close(open_terms.pop())  # no more arguments, the innermost open term ends here
 
-    def __parse_identifier(self, id_token):
-        if self.__possible(LeftParensToken):
-            args = []
+            # add the term to the innermost open term, closing any lists that cannot take more items
             while True:
-                arg = self.__parse_term()
-                if arg is None:
+                if not open_terms:
+                    return term
+                open_term = open_terms[-1]
+                open_term.items.append(term)
+                if open_term.name is not None:
+                    self.__possible(COMMA_KIND)  # commas between arguments are optional
                     break
-                args.append(arg)
-                self.__possible(CommaToken)
-            self.__expect(RightParensToken)
-            return ApplTerm(id_token.value, args)
-        if self.__possible(LeftBracketToken):
-            name = self.__expect(IdToken)
-            self.__expect(RightBracketToken)
-            return MapReadTerm(VarTerm(id_token.value), VarTerm(name.value))
+                if self.__possible(COMMA_KIND):
+                    break
+                term = self.__close(open_terms.pop())
+
+    def __parse_variable(self, name):
+        if self.__possible(LEFT_BRACKET_KIND):
+            key = self.__expect(ID_KIND)
+            self.__expect(RIGHT_BRACKET_KIND)
+            return MapReadTerm(VarTerm(name), VarTerm(key))
+        else:
+            return VarTerm(name)
+
+    def __close(self, open_term):
+        if open_term.name is not None:
+            self.__expect(RIGHT_PARENS_KIND)
+            return ApplTerm(open_term.name, open_term.items)
+
+        # list pattern
+        if self.__possible_value(OPERATOR_KIND, "|"):
+            for i in open_term.items:
+                if not isinstance(i, VarTerm):
+                    raise self.__error("Expected list pattern to only include VarTerms")
+            rest = self.__expect_term()
+            if not isinstance(rest, VarTerm):
+                raise self.__error("Expected list pattern to only include VarTerms")
+            self.__expect(RIGHT_BRACKET_KIND)
+            return ListPatternTerm(open_term.items, rest)
         else:
-            return VarTerm(id_token.value)
+            self.__expect(RIGHT_BRACKET_KIND)
+            return ListTerm(open_term.items)
 
-    def __parse_new_environment(self, token):
+    def __parse_new_environment(self):
         assignments = {}
         while True:
             name = self.__parse_term()
@@ -150,82 +262,56 @@ class Parser:
                 break
             if not isinstance(name, VarTerm):
                 raise ParseError("Expected a variable term but found " + str(name), None)
-            if self.__possible_value(OperatorToken, "|-->"):
+            if self.__possible_value(OPERATOR_KIND, "|-->"):
                 value = self.__expect_term()
             else:
                 value = MapWriteTerm()  # TODO this is by "convention" but not necessarily clear
             assignments[name] = value
-            self.__possible(CommaToken)
-        self.__expect(RightBraceToken)
+            self.__possible(COMMA_KIND)
+        self.__expect(RIGHT_BRACE_KIND)
         return MapWriteTerm(assignments)
 
-    def __parse_list(self, token):
-        items = []
-
-        # normal list
-        while True:
-            term = self.__parse_term()
-            if term is None:
-                break
-            items.append(term)
-            if not self.__possible(CommaToken):
-                break
-
-        # list pattern
-        if self.__possible_value(OperatorToken, "|"):
-            for i in items:
-                if not isinstance(i, VarTerm):
-                    raise ParseError("Expected list pattern to only include VarTerms", token)
-            rest = self.__expect_term()
-            if not isinstance(rest, VarTerm):
-                raise ParseError("Expected list pattern to only include VarTerms", token)
-            self.__expect(RightBracketToken)
-            return ListPatternTerm(items, rest)
-        else:
-            self.__expect(RightBracketToken)
-            return ListTerm(items)
-
     def __expect_term(self):
         term = self.__parse_term()
         if term is None:
-            raise ParseError("Expected to parse a term", self.tokenizer.next())
+            raise self.__error("Expected to parse a term")
         return term
 
     def __parse_premise(self):
-        if self.__possible_value(KeywordToken, "case"):
+        if self.__possible_value(KEYWORD_KIND, "case"):
             return self.__parse_case()
 
         left = self.__parse_term()
-        operator = self.__expect(OperatorToken)
+        operator = self.__expect(OPERATOR_KIND)
         right = self.__parse_term()
 
-        if "==" == operator.value:
+        if "==" == operator:
             return EqualityCheckPremise(left, right)
-        elif "=>" == operator.value:
+        elif "=>" == operator:
             if isinstance(right, ApplTerm):
                 return PatternMatchPremise(left, right)
             else:
                 return AssignmentPremise(left, right)
-        elif "-->" == operator.value:
+        elif "-->" == operator:
             return ReductionPremise(left, right)
         else:
             raise NotImplementedError()
 
     def __parse_case(self):
         var = self.__expect_term()
-        self.__expect_value(KeywordToken, "of")
-        self.__expect(LeftBraceToken)
+        self.__expect_value(KEYWORD_KIND, "of")
+        self.__expect(LEFT_BRACE_KIND)
 
         values = []
         sub_premises = []
         while True:
-            if self.__possible_value(KeywordToken, "otherwise"):
+            if self.__possible_value(KEYWORD_KIND, "otherwise"):
                 values.append(None)
             else:
                 values.append(self.__expect_term())
-            self.__expect_value(OperatorToken, "=>")
+            self.__expect_value(OPERATOR_KIND, "=>")
             sub_premises.append(self.__parse_premise())
-            if self.__possible(RightBraceToken):
+            if self.__possible(RIGHT_BRACE_KIND):
                 break
 
         return CasePremise(var, values, sub_premises)
@@ -235,23 +321,23 @@ class Parser:
 
         # parse semantic components
         components = []
-        if self.__possible_value(OperatorToken, "|-"):
+        if self.__possible_value(OPERATOR_KIND, "|-"):
             components.append(before)
             before = self.__expect_term()
 
         # read body
-        self.__expect_value(OperatorToken, "-->")
+        self.__expect_value(OPERATOR_KIND, "-->")
         after = self.__expect_term()
 
         # parse premises
         premises = []
-        if self.__possible_value(KeywordToken, "where"):
+        if self.__possible_value(KEYWORD_KIND, "where"):
             while True:
                 premise = self.__parse_premise()
                 premises.append(premise)
-                if not self.__possible(SemiColonToken):
+                if not self.__possible(SEMICOLON_KIND):
                     break
-            self.__possible(PeriodToken)
+            self.__possible(PERIOD_KIND)
 
         # assign slot numbers
         number_of_bound_terms = SlotAssigner().assign_rule(before, after, premises)
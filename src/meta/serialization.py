@@ -0,0 +1,406 @@
+import os
+
+from src.meta.dynsem import Module, Rule, PatternMatchPremise, EqualityCheckPremise, \
+    AssignmentPremise, ReductionPremise, CasePremise
+from src.meta.term import ApplTerm, ListTerm, ListPatternTerm, IntTerm, VarTerm, MapReadTerm, MapWriteTerm, int_term
+
+# node tags; terms are written in post-order so that reading them back only needs a stack of the terms read so far
+END_TAG = 0  # follows the nodes of each term
+APPL_TAG = 1
+LIST_TAG = 2
+INT_TAG = 3
+VAR_TAG = 4
+LIST_PATTERN_TAG = 5
+MAP_READ_TAG = 6
+MAP_WRITE_TAG = 7
+
+# premise tags
+PATTERN_MATCH_TAG = 1
+EQUALITY_CHECK_TAG = 2
+ASSIGNMENT_TAG = 3
+REDUCTION_TAG = 4
+CASE_TAG = 5
+
+PROGRAM_HEADER = "E2C\x02"  # the magic and format version of .e2c files
+MODULE_HEADER = "DSC\x02"  # the magic and format version of module snapshots; bump it whenever how a Module is built or
+# written changes (e.g. slot assignment), as it is part of the digest of the E2 snapshot
+
+
+class SerializationError(Exception):
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __str__(self):
+        return self.reason
+
+
+def content_hash(text):
+    """The 32-bit FNV-1a hash of a text, stable across processes (unlike hash())"""
+    hash = 0x811c9dc5
+    for c in text:
+        hash = ((hash ^ ord(c)) * 0x01000193) & 0xffffffff
+    return hash
+
+
+class TermWriter:
+    """Serialize terms to a compact binary string: varint-encoded numbers, names written once and then referred to by
+    index, and nodes in post-order, written without recursion so deeply nested terms can be serialized"""
+
+    def __init__(self):
+        self.chunks = []
+        self.names = {}
+
+    def data(self):
+        return "".join(self.chunks)
+
+    def write_number(self, number):
+        """Write an unsigned number as a varint"""
+        assert number >= 0
+        while number >= 0x80:
+            self.chunks.append(chr((number & 0x7f) | 0x80))
+            number >>= 7
+        self.chunks.append(chr(number))
+
+    def write_signed(self, number):
+        self.write_number((number << 1) if number >= 0 else ((-number - 1) << 1) | 1)
+
+    def write_string(self, string):
+        self.write_number(len(string))
+        self.chunks.append(string)
+
+    def write_name(self, name):
+        """Write the index of a name, followed by the name itself the first time it is written"""
+        index = self.names.get(name, -1)
+        if index >= 0:
+            self.write_number(index)
+        else:
+            index = len(self.names)
+            self.names[name] = index
+            self.write_number(index)
+            self.write_string(name)
+
+    def write_term(self, term):
+        pending = [term]
+        expanded = [False]
+        while pending:
+            term = pending.pop()
+            if expanded.pop():
+                self.__write_node(term)
+                continue
+            pending.append(term)
+            expanded.append(True)
+            children = children_of(term)
+            for i in range(len(children) - 1, -1, -1):
+                pending.append(children[i])
+                expanded.append(False)
+        self.write_number(END_TAG)
+
+    def __write_node(self, term):
+        if isinstance(term, ApplTerm):
+            self.write_number(APPL_TAG)
+            self.write_name(term.name)
+            self.write_number(len(term.args))
+        elif isinstance(term, ListTerm):
+            self.write_number(LIST_TAG)
+            self.write_number(term.length())
+        elif isinstance(term, IntTerm):
+            self.write_number(INT_TAG)
+            self.write_signed(term.number)
+        elif isinstance(term, VarTerm):
+            self.write_number(VAR_TAG)
+            self.write_name(term.name)
+            self.write_signed(term.slot)
+        elif isinstance(term, ListPatternTerm):
+            self.write_number(LIST_PATTERN_TAG)
+            self.write_number(len(term.vars))
+        elif isinstance(term, MapReadTerm):
+            self.write_number(MAP_READ_TAG)
+        elif isinstance(term, MapWriteTerm):
+            self.write_number(MAP_WRITE_TAG)
+            self.write_number(len(term.assignments))
+        else:
+            raise SerializationError("Unable to serialize term: %s" % term)
+
+
+def children_of(term):
+    """The sub-terms of a term in the order they are written"""
+    if isinstance(term, ApplTerm):
+        return term.args
+    elif isinstance(term, ListTerm):
+        return term.to_list()
+    elif isinstance(term, ListPatternTerm):
+        return term.vars + [term.rest]
+    elif isinstance(term, MapReadTerm):
+        return [term.map, term.key]
+    elif isinstance(term, MapWriteTerm):
+        children = []
+        for key in term.assignments:
+            children.append(key)
+            children.append(term.assignments[key])
+        return children
+    else:
+        return []
+
+
+class TermReader:
+    """Read back what a TermWriter wrote"""
+
+    def __init__(self, data, position=0):
+        self.data = data
+        self.position = position
+        self.names = []
+
+    def read_byte(self):
+        if self.position >= len(self.data):
+            raise SerializationError("Unexpected end of data")
+        byte = ord(self.data[self.position])
+        self.position += 1
+        return byte
+
+    def read_number(self):
+        number = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            number |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return number
+            shift += 7
+
+    def read_signed(self):
+        number = self.read_number()
+        return -(number >> 1) - 1 if number & 1 else number >> 1
+
+    def read_string(self):
+        length = self.read_number()
+        start = self.position
+        end = start + length
+        if end > len(self.data):
+            raise SerializationError("Unexpected end of data")
+        assert start >= 0
+        self.position = end
+        return self.data[start:end]
+
+    def read_name(self):
+        index = self.read_number()
+        if index == len(self.names):
+            self.names.append(self.read_string())
+        elif index > len(self.names):
+            raise SerializationError("Unknown name index: %d" % index)
+        return self.names[index]
+
+    def read_term(self):
+        """Read the nodes of a term up to its end tag"""
+        terms = []
+        while True:
+            tag = self.read_number()
+            if tag == END_TAG:
+                if len(terms) != 1:
+                    raise SerializationError("Expected a single term but read %d" % len(terms))
+                return terms[0]
+            elif tag == APPL_TAG:
+                name = self.read_name()
+                term = ApplTerm(name, self.__pop(terms, self.read_number()))
+            elif tag == LIST_TAG:
+                term = ListTerm(self.__pop(terms, self.read_number()))
+            elif tag == INT_TAG:
+                term = int_term(self.read_signed())
+            elif tag == VAR_TAG:
+                name = self.read_name()
+                term = VarTerm(name, self.read_signed())
+            elif tag == LIST_PATTERN_TAG:
+                number_of_vars = self.read_number()
+                rest = self.__pop(terms, 1)[0]
+                term = ListPatternTerm(self.__pop(terms, number_of_vars), rest)
+            elif tag == MAP_READ_TAG:
+                children = self.__pop(terms, 2)
+                term = MapReadTerm(children[0], children[1])
+            elif tag == MAP_WRITE_TAG:
+                children = self.__pop(terms, 2 * self.read_number())
+                assignments = {}
+                for i in range(0, len(children), 2):
+                    assignments[children[i]] = children[i + 1]
+                term = MapWriteTerm(assignments)
+            else:
+                raise SerializationError("Unknown tag: %d" % tag)
+            terms.append(term)
+
+    @staticmethod
+    def __pop(terms, count):
+        if count > len(terms):
+            raise SerializationError("Expected %d terms but only %d were read" % (count, len(terms)))
+        start = len(terms) - count
+        assert start >= 0
+        popped = terms[start:]
+        del terms[start:]
+        return popped
+
+
+def write_program(program, size, mtime):
+    """Serialize a parsed program along with the size and modification time of its source, e.g. for a .e2c file"""
+    writer = TermWriter()
+    writer.chunks.append(PROGRAM_HEADER)
+    writer.write_number(size)
+    writer.write_signed(mtime)  # negative before 1970, e.g. for a file restored with touch -d
+    writer.write_term(program)
+    return writer.data()
+
+
+def read_program(data, size, mtime):
+    """Deserialize a program written by write_program or return None if it was written for a source of another size
+    or modification time (or with another format version)"""
+    if not data.startswith(PROGRAM_HEADER):
+        return None
+    reader = TermReader(data, len(PROGRAM_HEADER))
+    if reader.read_number() != size or reader.read_signed() != mtime:
+        return None
+    return reader.read_term()
+
+
+class ModuleWriter(TermWriter):
+    """Serialize a built Module: its rules, with their slot assignments and loop flags, and the signatures of its
+    native functions (the native functions themselves are re-bound by name when reading)"""
+
+    def write_module(self, module):
+        self.write_number(len(module.rules))
+        for rule in module.rules:
+            self.write_term(rule.before)
+            self.write_term(rule.after)
+            self.write_number(len(rule.components))
+            for component in rule.components:
+                self.write_term(component)
+            self.write_number(len(rule.premises))
+            for premise in rule.premises:
+                self.write_premise(premise)
+            self.write_number(rule.number_of_bound_terms)
+            self.write_number(1 if rule.has_loop else 0)
+        self.write_number(len(module.native_functions))
+        for native_function in module.native_functions:
+            self.write_term(native_function.before)
+            self.write_number(native_function.argument_kind)
+            self.write_number(native_function.result_kind)
+
+    def write_premise(self, premise):
+        if isinstance(premise, CasePremise):
+            self.write_number(CASE_TAG)
+            self.write_term(premise.left)
+            self.write_number(len(premise.values))
+            for i in range(len(premise.values)):
+                if premise.values[i] is None:
+                    self.write_number(0)  # otherwise
+                else:
+                    self.write_number(1)
+                    self.write_term(premise.values[i])
+                self.write_premise(premise.premises[i])
+            return
+
+        if isinstance(premise, PatternMatchPremise):
+            self.write_number(PATTERN_MATCH_TAG)
+        elif isinstance(premise, EqualityCheckPremise):
+            self.write_number(EQUALITY_CHECK_TAG)
+        elif isinstance(premise, AssignmentPremise):
+            self.write_number(ASSIGNMENT_TAG)
+        elif isinstance(premise, ReductionPremise):
+            self.write_number(REDUCTION_TAG)
+        else:
+            raise SerializationError("Unable to serialize premise: %s" % premise)
+        self.write_term(premise.left)
+        self.write_term(premise.right)
+
+
+class ModuleReader(TermReader):
+    def read_module(self, native_functions):
+        """Read a Module, binding each native function to the one of the same name and signature; these are built
+        up front rather than from their actions here, which keeps each typed action attribute of NativeFunction to
+        actions of a single signature"""
+        available = {}
+        for native_function in native_functions:
+            available[native_function.before.name] = native_function
+        rules = []
+        for i in range(self.read_number()):
+            before = self.read_term()
+            after = self.read_term()
+            components = [self.read_term() for j in range(self.read_number())]
+            premises = [self.read_premise() for j in range(self.read_number())]
+            number_of_bound_terms = self.read_number()
+            has_loop = self.read_number() == 1
+            rules.append(Rule(before, after, components, premises, number_of_bound_terms, has_loop))
+        bound = []
+        for i in range(self.read_number()):
+            before = self.read_term()
+            argument_kind = self.read_number()
+            result_kind = self.read_number()
+            native_function = available.get(before.name, None)
+            if native_function is None:
+                raise SerializationError("No native function: %s" % before.name)
+            if native_function.arity != len(before.args) or native_function.argument_kind != argument_kind or \
+                    native_function.result_kind != result_kind:
+                raise SerializationError("The signature of native function %s has changed" % before.name)
+            bound.append(native_function)
+        return Module(rules, bound)
+
+    def read_premise(self):
+        tag = self.read_number()
+        if tag == CASE_TAG:
+            left = self.read_term()
+            values = []
+            premises = []
+            for i in range(self.read_number()):
+                values.append(self.read_term() if self.read_number() == 1 else None)
+                premises.append(self.read_premise())
+            return CasePremise(left, values, premises)
+
+        left = self.read_term()
+        right = self.read_term()
+        if tag == PATTERN_MATCH_TAG:
+            return PatternMatchPremise(left, right)
+        elif tag == EQUALITY_CHECK_TAG:
+            return EqualityCheckPremise(left, right)
+        elif tag == ASSIGNMENT_TAG:
+            return AssignmentPremise(left, right)
+        elif tag == REDUCTION_TAG:
+            return ReductionPremise(left, right)
+        else:
+            raise SerializationError("Unknown premise tag: %d" % tag)
+
+
+def write_module(module, digest):
+    """Snapshot a Module along with the content_hash of what it was built from"""
+    writer = ModuleWriter()
+    writer.chunks.append(MODULE_HEADER)
+    writer.write_number(digest)
+    writer.write_module(module)
+    return writer.data()
+
+
+def read_module(data, digest, native_functions):
+    """Load a Module snapshot, binding its native functions by name to the given ones, or return None if it was
+    taken of something else (or with another format version)"""
+    if not data.startswith(MODULE_HEADER):
+        return None
+    reader = ModuleReader(data, len(MODULE_HEADER))
+    if reader.read_number() != digest:
+        return None
+    return reader.read_module(native_functions)
+
+
+def load_file(filename):
+    """Read a serialized file as a string of bytes, under either Python 2 or 3; not for translated code, see
+    src/main/e2.py for that"""
+    with open(filename, "rb") as file:
+        data = file.read()
+    return data if isinstance(data, str) else data.decode("latin-1")
+
+
+def save_file(filename, data):
+    """Write a serialized file to a temporary file renamed over the original once complete, so that concurrent
+    readers see either the old or the new file but never a partially written one"""
+    temporary = "%s.%d.tmp" % (filename, os.getpid())
+    try:
+        with open(temporary, "wb") as file:
+            file.write(data if isinstance(data, bytes) else data.encode("latin-1"))
+        os.rename(temporary, filename)
+    except (IOError, OSError):
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
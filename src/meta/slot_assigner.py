@@ -2,49 +2,124 @@ from src.meta.dynsem import PatternMatchPremise, EqualityCheckPremise, Reduction
 from src.meta.term import Term, VarTerm
 
 
+class Occurrence:
+    """A variable appearing in a rule: bound or resolved at a step (0 for the rule's before term, i for its i-th
+    premise and one past the last premise for its after term)"""
+
+    def __init__(self, var, step, bound):
+        self.var = var
+        self.step = step
+        self.bound = bound
+
+
+class Lifetime:
+    """The steps from which a variable is first bound to where it is last resolved; a variable that is never
+    resolved after being bound is dead (last is -1) and needs no slot"""
+
+    def __init__(self, first):
+        self.first = first
+        self.first_occurrence = -1  # the index of the binding occurrence; earlier occurrences are unbound
+        self.last = -1
+        self.last_bound = first  # a variable may be bound again (e.g. x --> x), which must not clobber a reused slot
+        self.slot = -1
+
+
 class SlotAssigner:
     def __init__(self):
         self.mapping = {}
         self.slot = 0
+        self.occurrences = []
 
     def assign_rule(self, before, after, premises):
+        """Assign context slots to the variables of a rule and return the number of slots used. A liveness pass over
+        the rule lets variables whose lifetimes do not overlap share a slot: a slot is reused once the variable holding
+        it has been resolved for the last time in an earlier step. Variables that are never resolved after being bound
+        (e.g. y in block([x | xs]) --> block(xs) where x --> y) are assigned slot -1 and are not bound at all."""
         if not isinstance(before, Term) or not isinstance(after, Term) or not isinstance(premises, list):
             raise ValueError("Expected before and after terms and a list of premises but was passed: %s, %s, %s" % (
             before, after, premises))
 
-        slot_before = self.slot
-        self.__bound(before)
-        for premise in premises:
-            self.assign_premise(premise)
-        self.__resolved(after)
+        self.occurrences = []
+        self.__collect(before, 0, True)
+        for i in range(len(premises)):
+            self.__collect_premise(premises[i], i + 1)
+        self.__collect(after, len(premises) + 1, False)
 
-        return self.slot - slot_before
+        lifetimes = {}
+        order = []
+        for i in range(len(self.occurrences)):
+            occurrence = self.occurrences[i]
+            name = occurrence.var.name
+            if name not in lifetimes:
+                if not occurrence.bound:
+                    continue  # resolved before it is ever bound, so left as an unbound variable
+                lifetimes[name] = Lifetime(occurrence.step)
+                lifetimes[name].first_occurrence = i
+                order.append(lifetimes[name])
+            elif not occurrence.bound:
+                lifetimes[name].last = occurrence.step
+            else:
+                lifetimes[name].last_bound = occurrence.step
 
-    def assign_premise(self, premise):
+        used = self.__allocate(order)
+        for i in range(len(self.occurrences)):
+            occurrence = self.occurrences[i]
+            name = occurrence.var.name
+            if name in lifetimes and i >= lifetimes[name].first_occurrence:
+                occurrence.var.slot = lifetimes[name].slot
+            else:
+                occurrence.var.slot = -1
+        self.occurrences = []
+
+        self.slot += used
+        return used
+
+    def __allocate(self, lifetimes):
+        """Give each live variable, in the order they are first bound, the lowest slot free at that step"""
+        holders = []  # the lifetime currently holding each slot
+        for lifetime in lifetimes:
+            if lifetime.last < 0:
+                continue
+            lifetime.last = max(lifetime.last, lifetime.last_bound)
+            for slot in range(len(holders)):
+                if holders[slot].last < lifetime.first:
+                    lifetime.slot = self.slot + slot
+                    holders[slot] = lifetime
+                    break
+            else:
+                lifetime.slot = self.slot + len(holders)
+                holders.append(lifetime)
+        return len(holders)
+
+    def __collect_premise(self, premise, step):
         if premise is None:
             raise ValueError("Expected a premise, not none")
 
-        slot_before = self.slot
-        if isinstance(premise, PatternMatchPremise):
-            self.__bound(premise.left)
-            self.__resolved(premise.right)
-        if isinstance(premise, AssignmentPremise):  # TODO remove
-            self.__bound(premise.left)
-            self.__resolved(premise.right)
+        if isinstance(premise, PatternMatchPremise) or isinstance(premise, AssignmentPremise):
+            self.__collect(premise.left, step, True)
+            self.__collect(premise.right, step, False)
         elif isinstance(premise, EqualityCheckPremise):
-            self.__resolved(premise.left)
-            self.__resolved(premise.right)
+            self.__collect(premise.left, step, False)
+            self.__collect(premise.right, step, False)
         elif isinstance(premise, ReductionPremise):
-            self.__resolved(premise.left)
-            self.__bound(premise.right)
+            self.__collect(premise.left, step, False)
+            self.__collect(premise.right, step, True)
         elif isinstance(premise, CasePremise):
-            self.__resolved(premise.left)
+            self.__collect(premise.left, step, False)
             for subpremise in premise.premises:
-                self.assign_premise(subpremise)
+                self.__collect_premise(subpremise, step)  # all cases share the step of the case premise
         else:
             raise NotImplementedError("Unknown premise type: " + premise.__class__.__name__)
 
-        return self.slot - slot_before
+    def __collect(self, term, step, bound):
+        if term is None:
+            raise ValueError("Expected a term, not none")
+
+        def add_occurrence(term, assigner):
+            if isinstance(term, VarTerm):
+                assigner.occurrences.append(Occurrence(term, step, bound))
+
+        term.walk(add_occurrence, self)
 
     def __bound(self, term):
         if term is None:
@@ -61,21 +136,9 @@ class SlotAssigner:
 
         term.walk(set_as_bound, self)
 
-    def __resolved(self, term):
-        if term is None:
-            raise ValueError("Expected a term, not none")
-
-        def set_as_resolved(term, assigner):
-            if isinstance(term, VarTerm):
-                if term.name in assigner.mapping:
-                    term.slot = assigner.mapping[term.name]
-                else:
-                    pass
-                    # TODO print warning re: unresolvable var term
-
-        term.walk(set_as_resolved, self)
-
     def assign_term(self, term):
+        """Assign a slot to each distinct variable of a pattern bound outside of a rule and return the number of slots
+        used; see assign_rule for rules"""
         before_slot = self.slot
         self.__bound(term)
         return self.slot - before_slot
@@ -0,0 +1,174 @@
+from src.meta.context import Context
+from src.meta.dynsem import ReductionPremise, CasePremise, Rule, NativeFunction, INT_KIND
+from src.meta.interpreter import Interpreter
+from src.meta.term import ApplTerm, MapReadTerm, MapWriteTerm
+
+# So that you can still run this module under standard CPython...
+try:
+    from rpython.rlib.jit import promote
+except ImportError:
+    def promote(x):
+        return x
+
+
+class Frame:
+    """A transformation waiting on the values of its sub-terms; advance() returns the next sub-term to evaluate (its
+    value is passed back with resume()) or None once the transformation is complete and its result is set"""
+
+    def __init__(self):
+        self.result = None
+
+    def advance(self, interpreter):
+        raise NotImplementedError()
+
+    def resume(self, interpreter, value):
+        raise NotImplementedError()
+
+
+class RuleFrame(Frame):
+    def __init__(self, rule, context):
+        Frame.__init__(self)
+        self.rule = rule
+        self.context = context
+        self.premise = 0  # the index of the next premise to transform
+        self.waiting = None  # the reduction premise waiting on its value
+        self.writes = []  # the environment keys of the rule's result still to be written
+        self.write = 0  # the index of the next environment write
+        self.key = None  # the resolved environment key waiting on its value
+        if isinstance(rule.after, MapWriteTerm):
+            for key in rule.after.assignments:
+                if not isinstance(rule.after.assignments[key], MapWriteTerm):
+                    self.writes.append(key)
+
+    def advance(self, interpreter):
+        while self.premise < len(self.rule.premises):
+            premise = self.rule.premises[self.premise]
+            self.premise += 1
+            while isinstance(premise, CasePremise):
+                premise = interpreter.select_case(premise, self.context)
+            if isinstance(premise, ReductionPremise):
+                self.waiting = premise
+                return self.context.resolve(premise.left)
+            interpreter.transform_premise(premise, self.context)
+
+        if self.write < len(self.writes):
+            key = self.writes[self.write]
+            self.write += 1
+            self.key = self.context.resolve(key)
+            interpreter.check_environment_key(self.key)
+            return self.context.resolve(self.rule.after.assignments[key])
+
+        if isinstance(self.rule.after, MapReadTerm):
+            self.result = interpreter.read_environment(self.context.resolve(self.rule.after.key))
+        else:
+            self.result = self.context.resolve(self.rule.after)
+            interpreter.log("result", self.result)
+        return None
+
+    def resume(self, interpreter, value):
+        if self.waiting is not None:
+            self.context.bind_plan(self.waiting.plan, value)
+            self.waiting = None
+        else:
+            interpreter.write_environment(self.key, value)
+            self.key = None
+
+
+class NativeFrame(Frame):
+    def __init__(self, native_function, term):
+        Frame.__init__(self)
+        self.native_function = native_function
+        self.term = term
+        # the arguments, in fields rather than lists so that a call allocates nothing more than its frame; see
+        # Interpreter.transform_native_function
+        self.i0 = self.i1 = self.i2 = self.i3 = 0  # if the native function takes ints
+        self.t0 = self.t1 = self.t2 = self.t3 = None  # or if it takes terms
+        self.index = 0  # the index of the argument waiting on its value
+
+    def advance(self, interpreter):
+        native_function = self.native_function
+        if self.index < native_function.arity:
+            return self.term.args[self.index]
+        if native_function.argument_kind == INT_KIND:
+            self.result = interpreter.call_int_native(native_function, self.i0, self.i1, self.i2, self.i3)
+        else:
+            self.result = interpreter.call_term_native(native_function, self.t0, self.t1, self.t2, self.t3)
+        return None
+
+    def resume(self, interpreter, value):
+        if self.native_function.argument_kind == INT_KIND:
+            self.set_int(self.index, interpreter.int_argument(self.native_function, self.term.args[self.index], value))
+        else:
+            self.set_term(self.index, value)
+        self.index += 1
+
+    def set_int(self, index, value):
+        if index == 0:
+            self.i0 = value
+        elif index == 1:
+            self.i1 = value
+        elif index == 2:
+            self.i2 = value
+        else:
+            self.i3 = value
+
+    def set_term(self, index, value):
+        if index == 0:
+            self.t0 = value
+        elif index == 1:
+            self.t1 = value
+        elif index == 2:
+            self.t2 = value
+        else:
+            self.t3 = value
+
+
+class StackInterpreter(Interpreter):
+    """An evaluation mode for Interpreter that never recurses: every transformation waiting on the value of a sub-term
+    (a reduction premise, an environment write or a native argument) is kept as a frame on an explicit, heap-allocated
+    stack. Arbitrarily deep terms are evaluated in bounded native stack space with the same results as Interpreter.
+    This engine is interpreter-only: its loop has no JIT merge point, so use Interpreter where tracing matters."""
+
+    def interpret(self, term):
+        self.locate_variables(term)
+        try:
+            return self.evaluate(term)
+        finally:
+            self.output.flush()  # also when a transformation fails
+
+    def evaluate(self, term):
+        frames = []
+        while True:
+            frame = self.begin(term)
+            if frame is not None:
+                frames.append(frame)
+            elif frames:
+                frames[-1].resume(self, term)  # a terminal term is the value the top frame is waiting on
+            else:
+                return term
+
+            frame = frames[-1]
+            term = frame.advance(self)
+            if term is None:
+                frames.pop()
+                term = frame.result  # as in Interpreter, the result continues to be transformed
+
+    def begin(self, term):
+        """Start a frame for the transformation of the term or return None if the term is terminal"""
+        if not isinstance(term, ApplTerm):
+            return None
+        self.log("term", term)
+        transformation = promote(self.find_transformation(term))
+        if transformation is None:
+            self.log("no transformation found, returning", term)
+            return None
+        if isinstance(transformation, Rule):
+            self.log("rule", transformation)
+            context = Context(transformation.number_of_bound_terms, self.terms)
+            context.bind_plan(transformation.before_plan, term)
+            return RuleFrame(transformation, context)
+        elif isinstance(transformation, NativeFunction):
+            self.log("native", transformation)
+            return NativeFrame(transformation, term)
+        else:
+            raise NotImplementedError()
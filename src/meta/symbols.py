@@ -0,0 +1,25 @@
+class SymbolTable:
+    """Intern names (e.g. constructor and variable names) as small integer ids, handed out in order, so that names can
+    be compared as integers and used to index lists instead of being hashed and compared as strings"""
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        symbol = self.ids.get(name, -1)
+        if symbol < 0:
+            symbol = len(self.names)
+            self.ids[name] = symbol
+            self.names.append(name)
+        return symbol
+
+    def name_of(self, symbol):
+        return self.names[symbol]
+
+    def size(self):
+        return len(self.names)
+
+
+# the table shared by all terms; ids are only meaningful within a single process
+symbols = SymbolTable()
@@ -1,10 +1,15 @@
 from src.meta.printable import Printable
+from src.meta.symbols import symbols
 
 # So that you can still run this module under standard CPython...
 try:
     from rpython.rlib.rarithmetic import r_uint
     from rpython.rlib.objectmodel import compute_hash
+    from rpython.rlib.jit import unroll_safe
 except ImportError:
+    def unroll_safe(func):
+        return func
+
     class r_uint(int):
         pass
 
@@ -15,15 +20,19 @@ except ImportError:
 ALL_FIELDS = [
     'args[*]',
     'assignments',
+    'ground',
     'hash',
     'index?',
+    'internable',
     'items[*]',
     'key',
     'map',
     'name',
     'number',
+    'offset',
     'rest',
     'slot',
+    'symbol',
     'vars[*]',
 ]
 
@@ -60,7 +69,7 @@ class Term(Printable):
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self.__fields() == other.__fields()
         return NotImplemented
 
     def __ne__(self, other):
@@ -68,22 +77,51 @@ class Term(Printable):
             return not self.__eq__(other)
         return NotImplemented
 
+    def __fields(self):
+        """The fields compared by __eq__, leaving out what is only recorded to run the term: the ground flag of a
+        template and the environment index of a variable"""
+        fields = dict(self.__dict__)
+        fields.pop('ground', None)
+        fields.pop('index', None)
+        fields.pop('internable', None)  # derived from the sub-terms, and conservative for list views
+        return fields
+
+
+def is_internable(term):
+    """Whether a term is ground data, made only of integers, applications and lists, which the TermTable may intern;
+    for applications and lists this is recorded when they are built"""
+    if isinstance(term, IntTerm):
+        return True
+    elif isinstance(term, ApplTerm) or isinstance(term, ListTerm):
+        return term.internable
+    return False
+
+
+def all_internable(terms):
+    for term in terms:
+        if not is_internable(term):
+            return False
+    return True
+
 
 # TODO refactor this into ListTerm
 class ApplTerm(Term):
     _immutable_fields_ = ALL_FIELDS
 
-    def __init__(self, name, args=None):
+    def __init__(self, name, args=None, symbol=-1):
         Term.__init__(self)
         self.name = name
+        self.symbol = symbol if symbol >= 0 else symbols.intern(name)  # terms built from a template pass its symbol
         self.args = list(args) if args else []
         self.hash = r_uint(compute_hash(name)) + hash_terms(self.args)
+        self.ground = False  # see mark_ground
+        self.internable = all_internable(self.args)  # see is_internable
 
     def walk(self, visitor, accumulator=None):
         return visitor(self, accumulator) or self.walk_list(self.args, visitor, accumulator)
 
     def matches(self, term):
-        if not isinstance(term, self.__class__) or self.name != term.name or len(self.args) != len(term.args):
+        if not isinstance(term, self.__class__) or self.symbol != term.symbol or len(self.args) != len(term.args):
             return False
         for i in range(len(self.args)):
             if not self.args[i].matches(term.args[i]):
@@ -91,7 +129,9 @@ class ApplTerm(Term):
         return True
 
     def equals(self, term):
-        if not isinstance(term, self.__class__) or self.name != term.name or len(self.args) != len(term.args):
+        if self is term:
+            return True
+        if not isinstance(term, self.__class__) or self.symbol != term.symbol or len(self.args) != len(term.args):
             return False
         for i in range(len(self.args)):
             if not self.args[i].equals(term.args[i]):
@@ -106,38 +146,77 @@ class ApplTerm(Term):
 
 
 class ListTerm(Term):
+    """A list of terms. So that destructuring a list (e.g. binding [x | xs]) does not copy it, lists are views into a
+    storage list, `items`, beginning at `offset`; a tail shares the storage of its list. Use length(), get() and tail()
+    rather than indexing `items` directly."""
     _immutable_fields_ = ALL_FIELDS
 
-    def __init__(self, items=None):
+    def __init__(self, items=None, offset=0, view_hash=r_uint(0), view_internable=False):
         Term.__init__(self)
-        self.items = list(items) if items else []
-        self.hash = hash_terms(self.items)
+        if offset > 0:
+            # a view into the storage of another list, see tail()
+            self.items = items
+            self.offset = offset
+            self.hash = view_hash
+            self.internable = view_internable
+        else:
+            self.items = list(items) if items else []
+            self.offset = 0
+            self.hash = hash_terms(self.items)
+            self.internable = all_internable(self.items)  # see is_internable
+        self.ground = False  # see mark_ground
+
+    def length(self):
+        return len(self.items) - self.offset
+
+    def get(self, index):
+        return self.items[self.offset + index]
+
+    @unroll_safe
+    def tail(self, start):
+        """The list without its first start items, in O(start) time and space"""
+        if start == 0:
+            return self
+        hash = self.hash
+        for i in range(start):
+            hash -= self.get(i).hash << 5  # see hash_terms
+        return ListTerm(self.items, self.offset + start, hash, self.internable)
+
+    def to_list(self):
+        return self.items[self.offset:]
 
     def walk(self, visitor, accumulator=None):
-        return self.walk_list(self.items, visitor, accumulator)
+        return self.walk_list(self.to_list(), visitor, accumulator)
 
     def matches(self, term):
-        if not isinstance(term, self.__class__) or len(self.items) != len(term.items):
+        if not isinstance(term, self.__class__) or self.length() != term.length():
             return False
-        for i in range(len(self.items)):
-            if not self.items[i].matches(term.items[i]):
+        for i in range(self.length()):
+            if not self.get(i).matches(term.get(i)):
                 return False
         return True
 
     def equals(self, term):
-        if not isinstance(term, self.__class__) or len(self.items) != len(term.items):
+        if self is term:
+            return True
+        if not isinstance(term, self.__class__) or self.length() != term.length():
             return False
-        for i in range(len(self.items)):
-            if not self.items[i].equals(term.items[i]):
+        for i in range(self.length()):
+            if not self.get(i).equals(term.get(i)):
                 return False
         return True
 
     def to_string(self):
         args = []
-        for a in self.items:
+        for a in self.to_list():
             args.append(a.to_string())
         return "[%s]" % (", ".join(args))
 
+    def __eq__(self, other):
+        if isinstance(other, self.__class__):
+            return self.to_list() == other.to_list()
+        return NotImplemented
+
 
 class ListPatternTerm(Term):
     _immutable_fields_ = ALL_FIELDS
@@ -152,7 +231,7 @@ class ListPatternTerm(Term):
         return self.walk_list(self.vars, visitor, accumulator) or visitor(self.rest, accumulator)
 
     def matches(self, term):
-        if not isinstance(term, ListTerm) or len(self.vars) > len(term.items):
+        if not isinstance(term, ListTerm) or len(self.vars) > term.length():
             return False
         else:
             return True
@@ -182,18 +261,50 @@ class IntTerm(Term):
         return str(self.number)
 
 
+class IntTermCache:
+    """A table of canonical IntTerms for the integers in [low, high]; each entry is allocated on first use and shared
+    from then on, so that e.g. loop counters do not allocate a new IntTerm at every step"""
+    _immutable_fields_ = ['low', 'high']
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+        self.terms = [None] * (high - low + 1)
+
+    def get(self, number):
+        if number < self.low or number > self.high:
+            return IntTerm(number)
+        term = self.terms[number - self.low]
+        if term is None:
+            term = IntTerm(number)
+            self.terms[number - self.low] = term
+        return term
+
+
+# the range of integers served from the small integer cache; adjust to suit the programs being run
+SMALL_INT_MIN = -1024
+SMALL_INT_MAX = 65535
+small_ints = IntTermCache(SMALL_INT_MIN, SMALL_INT_MAX)
+
+
+def int_term(number):
+    """Create an IntTerm, sharing the cached instance for small integers"""
+    return small_ints.get(number)
+
+
 class VarTerm(Term):
     _immutable_fields_ = ALL_FIELDS
 
-    def __init__(self, name, slot=-1, index=-1):
+    def __init__(self, name, slot=-1, index=-1, symbol=-1):
         Term.__init__(self)
         self.name = name
+        self.symbol = symbol if symbol >= 0 else symbols.intern(name)
         self.slot = slot
         self.index = index
         self.hash = r_uint(compute_hash(self.name))
 
     def equals(self, term):
-        return isinstance(term, self.__class__) and self.name == term.name
+        return isinstance(term, self.__class__) and self.symbol == term.symbol
 
     def to_string(self):
         return "%s#%d" % (self.name, self.slot)
@@ -246,3 +357,114 @@ class MapReadTerm(Term):
 
     def to_string(self):
         return "%s[%s]" % (self.map.to_string(), self.key.to_string())
+
+
+def mark_ground(term):
+    """Flag the applications and lists of a template term that contain no slotted variables: resolving them in any
+    context gives the same term, so Context.resolve returns them as they are instead of rebuilding them. Returns
+    whether the term resolves to itself. An application with an empty list argument is never ground because resolving
+    it drops the empty list."""
+    if isinstance(term, VarTerm):
+        return term.slot < 0
+    elif isinstance(term, ApplTerm):
+        ground = True
+        for arg in term.args:
+            if not mark_ground(arg) or (isinstance(arg, ListTerm) and arg.length() == 0):
+                ground = False
+        term.ground = ground
+        return ground
+    elif isinstance(term, ListTerm):
+        ground = True
+        for i in range(term.length()):
+            if not mark_ground(term.get(i)):
+                ground = False
+        term.ground = ground
+        return ground
+    elif isinstance(term, MapWriteTerm):
+        for key in term.assignments:
+            mark_ground(key)
+            mark_ground(term.assignments[key])
+        return False
+    elif isinstance(term, MapReadTerm):
+        mark_ground(term.key)
+        return False
+    elif isinstance(term, ListPatternTerm):
+        return False
+    else:
+        return True
+
+
+class TermTable:
+    """An optional hash-consing table: building ground terms (see is_internable) through it returns a single canonical
+    instance for all structurally equal terms, deduplicating memory and letting equals() succeed on pointer comparison.
+    Terms with any other sub-term, e.g. a variable or a map, are built but not interned. To bound its memory, the table
+    is emptied once it holds capacity terms; terms already handed out remain valid (they simply stop being
+    canonical)."""
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.buckets = {}
+        self.size = 0
+
+    def appl(self, name, args, symbol=-1):
+        if symbol < 0:
+            symbol = symbols.intern(name)
+        if not all_internable(args):
+            return ApplTerm(name, args, symbol)
+        hash = r_uint(compute_hash(name)) + hash_terms(args)
+        for candidate in self.buckets.get(hash, []):
+            if isinstance(candidate, ApplTerm) and candidate.symbol == symbol and self.__same(candidate.args, args):
+                return candidate
+        return self.__add(ApplTerm(name, args, symbol))
+
+    def list(self, items):
+        if not all_internable(items):
+            return ListTerm(items)
+        hash = hash_terms(items)
+        for candidate in self.buckets.get(hash, []):
+            if isinstance(candidate, ListTerm) and self.__same(candidate.to_list(), items):
+                return candidate
+        return self.__add(ListTerm(items))
+
+    def integer(self, number):
+        if small_ints.low <= number <= small_ints.high:
+            return small_ints.get(number)
+        hash = r_uint(compute_hash(number))
+        for candidate in self.buckets.get(hash, []):
+            if isinstance(candidate, IntTerm) and candidate.number == number:
+                return candidate
+        return self.__add(IntTerm(number))
+
+    def __add(self, term):
+        if self.size >= self.capacity:
+            self.buckets.clear()
+            self.size = 0
+        if term.hash in self.buckets:
+            self.buckets[term.hash].append(term)
+        else:
+            self.buckets[term.hash] = [term]
+        self.size += 1
+        return term
+
+    @staticmethod
+    def __same(terms, others):
+        if len(terms) != len(others):
+            return False
+        for i in range(len(terms)):
+            if not TermTable.__identical(terms[i], others[i]):
+                return False
+        return True
+
+    @staticmethod
+    def __identical(term, other):
+        """Strict structural equality of internable terms; unlike equals(), no other kind of term is ever equal"""
+        if term is other:
+            return True
+        if isinstance(term, IntTerm):
+            return isinstance(other, IntTerm) and term.number == other.number
+        elif isinstance(term, ApplTerm):
+            return isinstance(other, ApplTerm) and term.symbol == other.symbol and \
+                TermTable.__same(term.args, other.args)
+        elif isinstance(term, ListTerm):
+            return isinstance(other, ListTerm) and TermTable.__same(term.to_list(), other.to_list())
+        return False
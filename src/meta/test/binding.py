@@ -0,0 +1,76 @@
+import unittest
+
+from src.meta.binding import BindingPlan
+from src.meta.context import Context, ContextError
+from src.meta.dynsem import Module
+from src.meta.parser import Parser
+from src.meta.slot_assigner import SlotAssigner
+
+
+class TestBindingPlan(unittest.TestCase):
+    def plan(self, pattern, checked=True):
+        pattern = Parser.term(pattern)
+        number_of_slots = SlotAssigner().assign_term(pattern)
+        return pattern, BindingPlan.build(pattern, checked), number_of_slots
+
+    def test_steps(self):
+        pattern, plan, _ = self.plan("block([x | xs])")
+
+        self.assertEqual("r1 = CHECK_APPL r0 1\n"
+                         "r2 = LOAD_ARGUMENT r0 0\n"
+                         "r3 = CHECK_LIST_PATTERN r2 1\n"
+                         "r4 = LOAD_ITEM r2 0 -> slot 0\n"
+                         "r5 = LOAD_TAIL r2 1 -> slot 1", plan.to_string())
+
+    def test_unchecked_plans_only_load(self):
+        _, plan, _ = self.plan("block([x | xs])", False)
+
+        self.assertEqual("r1 = LOAD_ARGUMENT r0 0\n"
+                         "r2 = LOAD_ITEM r1 0 -> slot 0\n"
+                         "r3 = LOAD_TAIL r1 1 -> slot 1", plan.to_string())
+
+    def test_sub_patterns_without_variables_are_skipped(self):
+        _, plan, _ = self.plan("a(b(1, c()), x)", False)
+
+        self.assertEqual("r1 = LOAD_ARGUMENT r0 1 -> slot 0", plan.to_string())
+
+    def test_variable_pattern(self):
+        _, plan, _ = self.plan("x")
+
+        self.assertEqual(0, plan.slot)
+        self.assertEqual(0, len(plan.operations))
+
+    def test_same_bindings_as_bind(self):
+        pattern, plan, number_of_slots = self.plan("a(b(x, [y, z]), [w | ws], v)")
+        term = Parser.term("a(b(1, [2, c(3)]), [4, 5, 6], d)")
+
+        expected = Context(number_of_slots)
+        expected.bind(pattern, term)
+        planned = Context(number_of_slots)
+        planned.bind_plan(plan, term)
+
+        self.assertEqual(expected.to_string(), planned.to_string())
+
+    def test_checked_plans_validate_the_term(self):
+        _, plan, number_of_slots = self.plan("a(b(x), [y])")
+        context = Context(number_of_slots)
+
+        with self.assertRaises(ContextError):
+            context.bind_plan(plan, Parser.term("a(b(1, 2), [3])"))
+        with self.assertRaises(ContextError):
+            context.bind_plan(plan, Parser.term("a(b(1), 2)"))
+        with self.assertRaises(ContextError):
+            context.bind_plan(plan, Parser.term("a(b(1), [2, 3])"))
+
+    def test_modules_plan_their_rules(self):
+        rule = Parser.rule("a(x) --> z where x --> b(y); y --> z")
+
+        Module([rule])
+
+        self.assertEqual("r1 = LOAD_ARGUMENT r0 0 -> slot 0", rule.before_plan.to_string())
+        self.assertEqual("r1 = CHECK_APPL r0 1\nr2 = LOAD_ARGUMENT r0 0 -> slot 1", rule.premises[0].plan.to_string())
+        self.assertEqual(0, rule.premises[1].plan.slot)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from src.meta.bytecode import Compiler, BytecodeInterpreter, MATCH_APPL, MATCH_LIST_PATTERN, BIND_SLOT, LOAD_SLOT, \
+    BUILD_APPL, REDUCE, POP, RETURN
+from src.meta.dynsem import Module
+from src.meta.parser import Parser
+from src.meta.test.engine import EngineTests
+from src.meta.term import VarTerm
+
+
+class TestCompiler(unittest.TestCase):
+    def test_block(self):
+        rule = Parser.rule("block([x | xs]) --> block(xs) where x --> y")
+
+        code = Compiler.compile(rule)
+
+        self.assertEqual([MATCH_APPL, 0, MATCH_LIST_PATTERN, 1, BIND_SLOT, 0, BIND_SLOT, 1, LOAD_SLOT, 0, REDUCE,
+                          POP, LOAD_SLOT, 1, BUILD_APPL, 1, RETURN], code.instructions)
+        self.assertEqual([rule.before, rule.after], code.constants)
+        self.assertEqual(2, code.number_of_slots)  # y is never used, so it is not bound
+
+    def test_premises_are_not_constants(self):
+        rule = Parser.rule("a(x) --> x where x == 1; case x of {1 => x => 2}")
+
+        code = Compiler.compile(rule)
+
+        self.assertEqual(rule.premises, code.premises)
+        for constant in code.constants:
+            self.assertNotIn(constant, rule.premises)
+
+    def test_printing(self):
+        code = Compiler.compile(Parser.rule("a(x) --> x"))
+
+        self.assertEqual("0: MATCH_APPL 0\n2: BIND_SLOT 0\n4: LOAD_SLOT 0\n6: RETURN ", code.to_string())
+
+
+class TestBytecodeInterpreter(EngineTests, unittest.TestCase):
+    engine = BytecodeInterpreter
+
+    def test_one_transformation(self):
+        mod = Module([Parser.rule("a(x) --> b where x == 1")])
+
+        result = BytecodeInterpreter(mod).interpret(Parser.term("a(1)"))
+
+        self.assertEqual(result, VarTerm("b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from src.meta.closure import ClosureInterpreter, compile_bind, compile_resolve
+from src.meta.context import ContextError
+from src.meta.parser import Parser
+from src.meta.slot_assigner import SlotAssigner
+from src.meta.test.engine import EngineTests
+from src.meta.term import ApplTerm, IntTerm, ListTerm, VarTerm
+
+
+class TestClosures(unittest.TestCase):
+    def test_bind_and_resolve(self):
+        pattern = Parser.term("x([a(b, [c | cs]), d])")
+        slots = [None] * SlotAssigner().assign_term(pattern)
+
+        compile_bind(pattern)(slots, Parser.term("x([a(1, [2, 3]), 4])"))
+
+        self.assertEqual([IntTerm(1), IntTerm(2), ListTerm([IntTerm(3)]), IntTerm(4)], slots)
+        template = ApplTerm("y", [VarTerm("d", 3), VarTerm("cs", 2), VarTerm("b", 0)])
+        self.assertEqual(Parser.term("y(4, [3], 1)"), compile_resolve(template)(slots))
+
+    def test_bind_error(self):
+        pattern = Parser.term("a(b, c)")
+        SlotAssigner().assign_term(pattern)
+
+        with self.assertRaises(ContextError):
+            compile_bind(pattern)([None, None], Parser.term("a(1)"))
+
+
+class TestClosureInterpreter(EngineTests, unittest.TestCase):
+    engine = ClosureInterpreter
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ import unittest
 from src.meta.context import Context, ContextError
 from src.meta.parser import Parser
 from src.meta.slot_assigner import SlotAssigner
-from src.meta.term import VarTerm, IntTerm, ListTerm
+from src.meta.term import VarTerm, IntTerm, ListTerm, mark_ground
 
 
 class TestContext(unittest.TestCase):
@@ -65,6 +65,18 @@ class TestContext(unittest.TestCase):
     def test_error_number_of_args(self):
         self.assertRaises(ContextError, self.bind, 'a(b, c)', 'a(1)')
 
+    def test_ground_terms_are_not_rebuilt(self):
+        self.bind('x(a)', 'x(1)')
+        template = Parser.term('b(c(2, [3]), a)')
+        template.args[1].slot = self.term1.args[0].slot
+        mark_ground(template)
+
+        resolved = self.sut.resolve(template)
+
+        self.assertEqual(Parser.term('b(c(2, [3]), 1)'), resolved)
+        self.assertIsNot(template, resolved)
+        self.assertIs(template.args[0], resolved.args[0])
+
     @unittest.skip("this check is done at a different level, e.g. in the rule-finding")
     def test_error_does_not_match(self):
         self.assertRaises(ContextError, self.bind, 'a(b, c)', 'b(1, 2)')
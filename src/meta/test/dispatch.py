@@ -0,0 +1,73 @@
+import unittest
+
+from src.meta.dispatch import Dispatcher, Switch, Leaf, shape_of
+from src.meta.dynsem import NativeFunction
+from src.meta.parser import Parser
+
+
+class TestDispatcher(unittest.TestCase):
+    def test_first_matching_rule(self):
+        zero = Parser.rule("while2(cond, 0, then) --> 0")
+        other = Parser.rule("while2(cond, value, then) --> while(cond, then)")
+        sut = Dispatcher([zero, other])
+
+        self.assertIs(zero, sut.find(Parser.term("while2(a, 0, b)")))
+        self.assertIs(other, sut.find(Parser.term("while2(a, 1, b)")))
+        self.assertIs(other, sut.find(Parser.term("while2(a, c(), b)")))
+
+    def test_priority_is_preserved(self):
+        other = Parser.rule("then(x) --> c")
+        zero = Parser.rule("then(0) --> b")
+        sut = Dispatcher([other, zero])
+
+        self.assertIs(other, sut.find(Parser.term("then(0)")))
+
+    def test_no_match(self):
+        sut = Dispatcher([Parser.rule("a(1) --> b"), Parser.rule("c() --> d")])
+
+        self.assertIsNone(sut.find(Parser.term("a(2)")))
+        self.assertIsNone(sut.find(Parser.term("a(1, 2)")))
+        self.assertIsNone(sut.find(Parser.term("b()")))
+
+    def test_nested_patterns(self):
+        inner = Parser.rule("a(b(1), [x, 2]) --> c")
+        outer = Parser.rule("a(b(y), z) --> d")
+        sut = Dispatcher([inner, outer])
+
+        self.assertIs(inner, sut.find(Parser.term("a(b(1), [3, 2])")))
+        self.assertIs(outer, sut.find(Parser.term("a(b(1), [3, 3])")))
+        self.assertIs(outer, sut.find(Parser.term("a(b(2), [])")))
+        self.assertIsNone(sut.find(Parser.term("a(c(1), [3, 2])")))
+
+    def test_list_patterns(self):
+        block = Parser.rule("block([x | xs]) --> block(xs)")
+        sut = Dispatcher([block])
+
+        self.assertIs(block, sut.find(Parser.term("block([1, 2])")))
+        self.assertIsNone(sut.find(Parser.term("block([])")))
+        self.assertIsNone(sut.find(Parser.term("block(a())")))
+
+    def test_each_position_tested_once(self):
+        sut = Dispatcher([Parser.rule("w(c, 0, t) --> 0"), Parser.rule("w(c, 1, t) --> 1"),
+                          Parser.rule("w(c, 2, t) --> 2"), Parser.rule("w(c, v, t) --> 3")])
+
+        self.assertIsInstance(sut.root, Switch)
+        self.assertEqual([], sut.root.path)
+        second = sut.root.branches[shape_of(Parser.term("w(c, 0, t)"))]
+        self.assertIsInstance(second, Switch)
+        self.assertEqual([1], second.path)
+        self.assertEqual(3, len(second.branches))
+        for branch in second.branches.values():
+            self.assertIsInstance(branch, Leaf)
+
+    def test_native_functions(self):
+        add = NativeFunction(Parser.native_function("add(x, y)"), lambda output, x, y: x + y)
+        rule = Parser.rule("add(0, y) --> y")
+        sut = Dispatcher([rule, add])
+
+        self.assertIs(rule, sut.find(Parser.term("add(0, 1)")))
+        self.assertIs(add, sut.find(Parser.term("add(1, 1)")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from src.meta.dispatch import shape_of
+from src.meta.dynsem import Module, NativeFunction
+from src.meta.parser import Parser
+
+
+class TestModule(unittest.TestCase):
+    def test_index_by_name_and_arity(self):
+        one = Parser.rule("a(x) --> b")
+        two = Parser.rule("a(x, y) --> c")
+        sut = Module([one, two])
+
+        self.assertEqual(sorted([shape_of(one.before), shape_of(two.before)]), sorted(sut.index.keys()))
+        self.assertIs(one, sut.find(Parser.term("a(1)")))
+        self.assertIs(two, sut.find(Parser.term("a(1, 2)")))
+        self.assertIsNone(sut.find(Parser.term("a(1, 2, 3)")))
+
+    def test_index_selects_first_discriminating_argument(self):
+        zero = Parser.rule("while2(cond, 0, then) --> 0")
+        other = Parser.rule("while2(cond, value, then) --> while(cond, then)")
+        sut = Module([zero, other])
+
+        root = sut.index[shape_of(zero.before)].root
+        self.assertEqual([1], root.path)
+        self.assertEqual([shape_of(Parser.term("0"))], list(root.branches.keys()))
+        self.assertIs(zero, sut.find(Parser.term("while2(a, 0, b)")))
+        self.assertIs(other, sut.find(Parser.term("while2(a, 1, b)")))
+        self.assertIs(other, sut.find(Parser.term("while2(a, x, b)")))
+
+    def test_index_buckets_by_head_shape(self):
+        lit = Parser.rule("eval(lit(x)) --> x")
+        plus = Parser.rule("eval(plus(x, y)) --> x")
+        empty = Parser.rule("eval([]) --> 0")
+        many = Parser.rule("eval([x | xs]) --> x")
+        sut = Module([lit, plus, empty, many])
+
+        self.assertIs(lit, sut.find(Parser.term("eval(lit(1))")))
+        self.assertIs(plus, sut.find(Parser.term("eval(plus(1, 2))")))
+        self.assertIs(empty, sut.find(Parser.term("eval([])")))
+        self.assertIs(many, sut.find(Parser.term("eval([1, 2])")))
+        self.assertIsNone(sut.find(Parser.term("eval(minus(1, 2))")))
+
+    def test_rules_before_native_functions(self):
+        add = NativeFunction(Parser.native_function("add(x, y)"), lambda output, x, y: x + y)
+        rule = Parser.rule("add(x, 0) --> x")
+        sut = Module([rule], [add])
+
+        self.assertIs(rule, sut.find(Parser.term("add(1, 0)")))
+        self.assertIs(add, sut.find(Parser.term("add(1, 1)")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,13 @@
+import os
 import unittest
 
-from src.meta.e2 import e2
-from src.meta.interpreter import Interpreter
+from src.meta.e2 import build
+from src.meta.interpreter import Interpreter, InterpreterError
+from src.meta.output import BufferedOutput, MemoryOutput
 from src.meta.parser import Parser
-from src.meta.term import ApplTerm, IntTerm
+from src.meta.term import ApplTerm, IntTerm, TermTable
+
+e2 = build()
 
 
 class TestE2(unittest.TestCase):
@@ -22,6 +26,46 @@ class TestE2(unittest.TestCase):
         self.assertEqual(result, ApplTerm("block"))
         self.assertEqual(len(result.args), 0)
 
+    def test_write(self):
+        term = Parser.term("block([write(1), write(add(1, 1))])")
+        output = MemoryOutput()
+
+        Interpreter(e2, 0, None, output).interpret(term)
+
+        self.assertEqual("1\n2\n", output.value())
+
+    def test_output_after_a_failing_program(self):
+        read_fd, write_fd = os.pipe()
+        try:
+            interpreter = Interpreter(e2, 0, None, BufferedOutput(write_fd))
+
+            with self.assertRaises(InterpreterError):
+                interpreter.interpret(Parser.term("block([write(1), write(add(1, a()))])"))
+            interpreter.interpret(Parser.term("block([write(5)])"))
+
+            os.write(write_fd, b"|")  # so that reading never blocks
+            self.assertEqual(b"1\n5\n|", os.read(read_fd, 1024))
+            self.assertEqual(-1, interpreter.nesting)
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+    def test_program_shared_with_another_interpreter(self):
+        program = Parser.term("block([assign(b, 7), write(retrieve(b))])")
+        other = Interpreter(e2, 0, None, MemoryOutput())
+        other.environment.locate("x")
+        other.environment.locate("y")
+        other.interpret(program)  # b is at index 2 in the other interpreter's environment
+        output = MemoryOutput()
+        interpreter = Interpreter(e2, 0, None, output)
+        with self.assertRaises(InterpreterError):
+            interpreter.interpret(Parser.term("add(1, a())"))
+
+        interpreter.interpret(program)
+
+        self.assertEqual("7\n", output.value())
+        self.assertEqual(0, program.args[0].get(0).args[0].index)
+
     def test_while(self):
         interpreter = Interpreter(e2)
         program = """
@@ -96,6 +140,21 @@ class TestE2(unittest.TestCase):
         # 328 seems about right: http://www.wolframalpha.com/input/?i=sum+primes+up+to+50&x=0&y=0
         self.assertEqual(interpreter.environment.locate_and_get("s"), IntTerm(328))
 
+    def test_interned_terms(self):
+        program = """
+        block([
+          assign(a, 0),
+          while(leq(retrieve(a), 10), block([assign(a, add(retrieve(a), 1))]))
+        ])
+        """
+        terms = TermTable()
+        interpreter = Interpreter(e2, 0, terms)
+
+        result = interpreter.interpret(Parser.term(program))
+
+        self.assertEqual(ApplTerm("block"), result)
+        self.assertIs(terms.integer(11), interpreter.environment.locate_and_get("a"))
+
 
 if __name__ == '__main__':
     unittest.main()
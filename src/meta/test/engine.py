@@ -0,0 +1,72 @@
+from src.meta.dynsem import Module, DynsemError
+from src.meta.e2 import build, native_functions
+from src.meta.interpreter import InterpreterError
+from src.meta.output import MemoryOutput
+from src.meta.parser import Parser
+from src.meta.term import ApplTerm, IntTerm, MapWriteTerm, VarTerm
+
+e2 = build()
+
+
+class EngineTests(object):
+    """The tests every engine must pass; mixed into a TestCase for each engine, which sets engine to its interpreter
+    class"""
+    engine = None
+
+    def test_reduction_premise(self):
+        mod = Module([Parser.rule("b() --> c()"), Parser.rule("a(x) --> y where x --> y")])
+
+        result = self.engine(mod).interpret(Parser.term("a(b())"))
+
+        self.assertEqual(ApplTerm("c"), result)
+
+    def test_invalid_premise(self):
+        mod = Module([Parser.rule("a() --> b() where 1 == 2")])
+
+        with self.assertRaises(DynsemError):
+            self.engine(mod).interpret(Parser.term("a()"))
+
+    def test_environment(self):
+        mod = Module([Parser.rule("E |- bindVar(k, v) --> {k |--> v, E}"), Parser.rule("E |- read(k) --> E[k]")])
+        sut = self.engine(mod)
+
+        self.assertIsInstance(sut.interpret(Parser.term("bindVar(a, 1)")), MapWriteTerm)
+        self.assertEqual(IntTerm(1), sut.interpret(Parser.term("read(a)")))
+
+    def test_invalid_environment_key_fails_before_its_value(self):
+        mod = Module([Parser.rule("E |- bindVar(k, v) --> {k |--> v, E}")], native_functions)
+        output = MemoryOutput()
+
+        with self.assertRaises(InterpreterError):
+            self.engine(mod, 0, None, output).interpret(Parser.term("bindVar(1, write(2))"))
+        self.assertEqual("", output.value())
+
+    def test_case(self):
+        mod = Module([Parser.rule("a(x) --> r where case x of {0 => r => zero otherwise => r => other}")])
+        sut = self.engine(mod)
+
+        self.assertEqual(VarTerm("zero"), sut.interpret(Parser.term("a(0)")))
+        self.assertEqual(VarTerm("other"), sut.interpret(Parser.term("a(1)")))
+
+    def test_case_without_match(self):
+        mod = Module([Parser.rule("a(x) --> r where case x of {0 => r => zero}")])
+
+        with self.assertRaises(DynsemError):
+            self.engine(mod).interpret(Parser.term("a(1)"))
+
+    def test_e2_while(self):
+        interpreter = self.engine(e2)
+        term = Parser.term("""
+        block([
+          assign(a, 0),
+          while(leq(retrieve(a), 10),
+            block([assign(a, add(retrieve(a), 1)), ifz(leq(retrieve(a), 5), assign(b, retrieve(a)), block())])
+          )
+        ])
+        """)
+
+        result = interpreter.interpret(term)
+
+        self.assertEqual(ApplTerm("block"), result)
+        self.assertEqual(IntTerm(11), interpreter.environment.locate_and_get("a"))
+        self.assertEqual(IntTerm(5), interpreter.environment.locate_and_get("b"))
@@ -1,6 +1,6 @@
 import unittest
 
-from src.meta.dynsem import Module, NativeFunction, DynsemError
+from src.meta.dynsem import Module, NativeFunction, DynsemError, INT_KIND, TERM_KIND, VOID_KIND
 from src.meta.interpreter import Interpreter
 from src.meta.parser import Parser
 from src.meta.term import IntTerm, MapWriteTerm, ApplTerm, VarTerm
@@ -59,6 +59,30 @@ class TestInterpreter(unittest.TestCase):
 
         self.assertEqual(result, 42)
 
+    def test_variables_are_located_before_running(self):
+        mod = Module([Parser.rule("E |- bindVar(k, v) --> {k |--> v, E}")])
+        term = Parser.term("bindVar(a, [b, c(d)])")
+        sut = Interpreter(mod)
+
+        sut.locate_variables(term)
+
+        self.assertEqual(sut.environment.locate("a"), term.args[0].index)
+        self.assertEqual(-1, term.args[1].get(0).index)  # b and d are never used as keys
+        self.assertEqual(1, len(sut.environment.values))
+
+    def test_variables_are_located_for_each_interpreter(self):
+        mod = Module([Parser.rule("E |- bindVar(k, v) --> {k |--> v, E}")])
+        term = Parser.term("bindVar(a, 1)")
+        first = Interpreter(mod)
+        second = Interpreter(mod)
+        second.environment.locate("b")  # so a has a different index in each environment
+
+        first.interpret(term)
+        second.interpret(term)
+
+        self.assertEqual(IntTerm(1), first.environment.locate_and_get("a"))
+        self.assertEqual(IntTerm(1), second.environment.locate_and_get("a"))
+
     def test_reduction_premise(self):
         mod = Module([Parser.rule("b() --> c()"), Parser.rule("a(x) --> y where x --> y")])
         term = Parser.term("a(b())")
@@ -76,7 +100,7 @@ class TestInterpreter(unittest.TestCase):
         self.assertEqual(result, ApplTerm("block"))
 
     def test_native(self):
-        add = NativeFunction(Parser.native_function("add(x, y)"), lambda x, y: x + y)
+        add = NativeFunction(Parser.native_function("add(x, y)"), lambda output, x, y: x + y)
         mod = Module([Parser.rule("a(x) --> add(x, 1)")], [add])
         term = Parser.term("a(1)")
 
@@ -84,6 +108,40 @@ class TestInterpreter(unittest.TestCase):
 
         self.assertEqual(result, IntTerm(2))
 
+    def test_native_arities(self):
+        natives = [NativeFunction(Parser.native_function("zero()"), lambda output: 0),
+                   NativeFunction(Parser.native_function("neg(x)"), lambda output, x: -x),
+                   NativeFunction(Parser.native_function("sum3(x, y, z)"), lambda output, x, y, z: x + y + z),
+                   NativeFunction(Parser.native_function("sum4(w, x, y, z)"), lambda output, w, x, y, z: w + x + y + z)]
+        term = Parser.term("sum4(zero(), neg(1), sum3(1, 2, 3), 4)")
+
+        result = Interpreter(Module([], natives)).interpret(term)
+
+        self.assertEqual(IntTerm(9), result)
+
+    def test_native_kinds(self):
+        written = []
+        natives = [NativeFunction(Parser.native_function("pair(x, y)"), lambda output, x, y: ApplTerm("tuple", [x, y]),
+                                  TERM_KIND, TERM_KIND),
+                   NativeFunction(Parser.native_function("log(x)"), lambda output, x: written.append(x), TERM_KIND,
+                                  VOID_KIND)]
+        mod = Module([Parser.rule("a(x) --> b(x)")], natives)
+
+        pair = Interpreter(mod).interpret(Parser.term("pair(a(1), 2)"))
+        void = Interpreter(mod).interpret(Parser.term("log(a(c))"))
+
+        self.assertEqual(Parser.term("tuple(b(1), 2)"), pair)
+        self.assertEqual(IntTerm(0), void)
+        self.assertEqual([Parser.term("b(c)")], written)
+
+    def test_native_result_of_another_kind(self):
+        with self.assertRaises(DynsemError):
+            NativeFunction(Parser.native_function("f(x)"), lambda output, x: IntTerm(x), INT_KIND, TERM_KIND)
+
+    def test_native_too_many_arguments(self):
+        with self.assertRaises(DynsemError):
+            NativeFunction(Parser.native_function("f(a, b, c, d, e)"), lambda output, a, b, c, d, e: 0)
+
     def test_interpreter_caching(self):
         if_rule = Parser.rule("if(a) --> then(a)")
         then1_rule = Parser.rule("then(0) --> b")
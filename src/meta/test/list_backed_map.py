@@ -1,6 +1,6 @@
 import unittest
 
-from src.meta.list_backed_map import ListBackedMap
+from src.meta.list_backed_map import ListBackedMap, EMPTY_SHAPE
 
 
 class TestMap(unittest.TestCase):
@@ -58,6 +58,50 @@ class TestMap(unittest.TestCase):
         self.assertEqual(43, sut.locate_and_get("b"))
         self.assertEqual(42, sut.locate_and_get("a"))
 
+    def test_reserved_names_are_sized_once(self):
+        sut = ListBackedMap()
+
+        indices = [sut.reserve_symbol(symbol) for symbol in range(100)]
+        self.assertEqual(0, len(sut.values))
+        sut.fit()
+
+        self.assertEqual(list(range(100)), indices)
+        self.assertEqual(100, len(sut.values))
+        self.assertEqual(42, sut.shape.find(42))
+        self.assertEqual(42, sut.reserve_symbol(42))
+
+    def test_shapes_are_shared(self):
+        first = ListBackedMap()
+        second = ListBackedMap()
+
+        first.locate("a")
+        first.locate("b")
+        second.locate("a")
+        second.locate("b")
+
+        self.assertIs(first.shape, second.shape)
+        self.assertEqual(2, first.shape.size)
+
+    def test_shapes_do_not_change(self):
+        sut = ListBackedMap()
+        sut.locate("a")
+        shape = sut.shape
+
+        sut.locate("b")
+
+        self.assertIsNot(shape, sut.shape)
+        self.assertEqual(-1, shape.find(sut.shape.symbol))  # b is not in the earlier shape
+        self.assertEqual(1, sut.shape.find(sut.shape.symbol))
+
+    def test_locating_again_keeps_the_shape(self):
+        sut = ListBackedMap()
+        sut.locate("a")
+        shape = sut.shape
+
+        self.assertEqual(0, sut.locate("a"))
+        self.assertIs(shape, sut.shape)
+        self.assertIs(shape, EMPTY_SHAPE.add(shape.symbol))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.meta.dynsem import DynsemError
+from src.meta.e2 import build
+from src.meta.interpreter import Interpreter
+from src.meta.loader import ModuleLoader
+from src.meta.output import MemoryOutput
+from src.meta.parser import Parser
+from src.meta.term import ApplTerm, IntTerm
+
+e2 = build()
+
+
+class TestModuleLoader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name + ".ds")
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as file:
+            file.write(text)
+        return path
+
+    def test_load_with_imports(self):
+        self.write("lang/values", """
+        module lang/values
+        signature
+          sorts V
+          constructors
+            NumV: Int -> V
+          native operators
+            add: Int * Int -> Int
+        rules
+          value(NumV(x)) --> x
+        """)
+        main = self.write("lang/main", """
+        module lang/main
+        imports lang/values
+        signature
+          sorts Expr
+          sort aliases
+            Env = Map(String, V)
+          constructors
+            Plus: Expr * Expr -> Expr
+            Zero: Expr
+          arrows
+            Expr --> V
+          components
+            E : Env
+        rules
+          Plus(a, b) --> NumV(z) where value(a) --> x; value(b) --> y; add(x, y) --> z
+        """)
+
+        module = ModuleLoader([self.directory], e2.native_functions).load(main)
+
+        self.assertEqual(2, len(module.rules))
+        self.assertEqual(["add"], [n.before.name for n in module.native_functions])
+        result = Interpreter(module, 0, None, MemoryOutput()).interpret(Parser.term("Plus(NumV(1), NumV(2))"))
+        self.assertEqual(ApplTerm("NumV", [IntTerm(3)]), result)
+
+    def test_parse_each_file_once(self):
+        self.write("common", "module common rules a() --> 1")
+        self.write("left", "module left imports common")
+        self.write("right", "module right imports common left")
+        main = self.write("main", "module main imports left right")
+        sut = ModuleLoader()
+
+        module = sut.load(main)
+
+        self.assertEqual(4, len(sut.parsed))
+        self.assertEqual(1, len(module.rules))
+
+    def test_signatures(self):
+        path = self.write("signatures", """
+        signature
+          constructors
+            Nil: List
+            Cons: E * List(E) -> List(E)
+        """)
+
+        builder = ModuleLoader().parse(path)
+
+        self.assertEqual([0, 2], [c.arity() for c in builder.constructors])
+        self.assertEqual("List", builder.constructors[1].result_sort.name)
+
+    def test_arity_mismatch(self):
+        main = self.write("main", """
+        signature
+          constructors
+            Plus: Expr * Expr -> Expr
+        rules
+          Plus(a) --> a
+        """)
+
+        with self.assertRaises(DynsemError):
+            ModuleLoader().load(main)
+
+    def test_missing_import(self):
+        main = self.write("main", "module main imports missing")
+
+        with self.assertRaises(DynsemError):
+            ModuleLoader().load(main)
+
+    def test_missing_native(self):
+        main = self.write("main", "signature native operators launch: Int -> Int")
+
+        with self.assertRaises(DynsemError):
+            ModuleLoader().load(main)
+
+
+if __name__ == '__main__':
+    unittest.main()
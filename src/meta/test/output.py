@@ -0,0 +1,50 @@
+import os
+import unittest
+
+from src.meta.output import BufferedOutput, MemoryOutput
+
+
+class TestBufferedOutput(unittest.TestCase):
+    def setUp(self):
+        self.read_fd, self.write_fd = os.pipe()
+
+    def tearDown(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def written(self):
+        os.write(self.write_fd, b"|")  # so that reading never blocks
+        return os.read(self.read_fd, 1024)
+
+    def test_buffered_until_flush(self):
+        sut = BufferedOutput(self.write_fd)
+
+        sut.write("1\n")
+        sut.write("2\n")
+        self.assertEqual(b"|", self.written())
+
+        sut.flush()
+        self.assertEqual(b"1\n2\n|", self.written())
+
+    def test_full_blocks_written(self):
+        sut = BufferedOutput(self.write_fd, 4)
+
+        sut.write("12")
+        sut.write("345")
+        sut.write("6")
+
+        self.assertEqual(b"12345|", self.written())
+
+
+class TestMemoryOutput(unittest.TestCase):
+    def test_value(self):
+        sut = MemoryOutput()
+
+        sut.write("a")
+        sut.write("b")
+
+        self.assertEqual("ab", sut.value())
+
+
+if __name__ == '__main__':
+    unittest.main()
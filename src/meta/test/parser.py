@@ -1,7 +1,7 @@
 import unittest
 
 from src.meta.dynsem import EqualityCheckPremise, Rule, CasePremise
-from src.meta.parser import Parser
+from src.meta.parser import Parser, ParseError
 from src.meta.term import ApplTerm, VarTerm, IntTerm, MapReadTerm, MapWriteTerm, ListTerm
 
 
@@ -11,7 +11,7 @@ class TestParser(unittest.TestCase):
             raise AssertionError("Lengths do not match: {} != {}".format(expected, actual))
         for i, e in enumerate(expected):
             self.assertIsInstance(actual[i], e.__class__)
-            self.assertEqual(e.location, actual[i].location) if e.location else None
+            self.assertEqual(e.offset, actual[i].offset) if e.offset >= 0 else None
             self.assertEqual(e.value, actual[i].value) if e.value else None
 
     def test_header(self):
@@ -46,7 +46,7 @@ class TestParser(unittest.TestCase):
 
         parsed = Parser.rule(text)
 
-        expected = Rule(ApplTerm("a", [VarTerm("x", 0), VarTerm("y", 1)]), VarTerm("b"), None, None, 2)
+        expected = Rule(ApplTerm("a", [VarTerm("x"), VarTerm("y")]), VarTerm("b"), None, None, 0)
         expected.premises.append(EqualityCheckPremise(IntTerm(1), IntTerm(1)))
 
         self.assertEqual(expected, parsed)
@@ -103,7 +103,71 @@ class TestParser(unittest.TestCase):
     def test_slot_assignment(self):
         rule = Parser.rule("block([x | xs]) --> block(xs) where x --> y")
 
-        self.assertEqual(3, rule.number_of_bound_terms)
+        self.assertEqual(2, rule.number_of_bound_terms)
+
+    def test_nested_lists_and_applications(self):
+        term = Parser.term("a([b, [c | d]], e(f) g[h], {x |--> 1})")
+
+        self.assertEqual(4, len(term.args))
+        self.assertIsInstance(term.args[0], ListTerm)
+        self.assertEqual("[c#-1 | d#-1]", term.args[0].get(1).to_string())
+        self.assertEqual("e(f#-1)", term.args[1].to_string())
+        self.assertIsInstance(term.args[2], MapReadTerm)
+        self.assertIsInstance(term.args[3], MapWriteTerm)
+
+    def test_deeply_nested_terms(self):
+        depth = 10000
+        term = Parser.term("a(" * depth + "[" * depth + "]" * depth + ")" * depth)
+
+        for i in range(depth):
+            self.assertEqual("a", term.name)
+            term = term.args[0]
+        for i in range(depth):
+            self.assertIsInstance(term, ListTerm)
+            term = term.get(0) if term.length() > 0 else None
+
+    def test_sort_sections(self):
+        module = Parser("""
+        module m
+        signature
+          sorts Expr sort
+          sort aliases
+            Env = Map(String, Int)
+          constructors
+            sort: List -> List
+            sorts: List -> List
+        rules
+          sort(xs) --> xs
+          sorts(xs) --> sort(xs)
+        """).all()
+
+        self.assertEqual(["Expr", "sort", "Env"], module.sorts)
+        self.assertEqual(["sort", "sorts"], [c.name for c in module.constructors])
+        self.assertEqual(["sort", "sorts"], [r.before.name for r in module.rules])
+
+    def test_rule_for_a_constructor_named_sort(self):
+        module = Parser("module m rules sort(xs) --> xs").all()
+
+        self.assertEqual(1, len(module.rules))
+
+    def test_native_sections(self):
+        module = Parser("""
+        module m
+        signature
+          native
+            add: Int * Int -> Int
+          native operators
+            sub: Int * Int -> Int
+        """).all()
+
+        self.assertEqual(["add", "sub"], [n.name for n in module.native_functions])
+
+    def test_error_location(self):
+        with self.assertRaises(ParseError) as context:
+            Parser.rule("a(x) -->\n  b(x where")
+
+        self.assertEqual(2, context.exception.location.line)
+        self.assertEqual(7, context.exception.location.offset)
 
 
 if __name__ == '__main__':
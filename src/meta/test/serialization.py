@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.meta import e2
+from src.meta.dynsem import NativeFunction, TERM_KIND
+from src.meta.interpreter import Interpreter
+from src.meta.output import MemoryOutput
+from src.meta.parser import Parser
+from src.meta.serialization import TermWriter, TermReader, SerializationError, read_program, \
+    write_program, read_module, write_module
+from src.meta.term import ApplTerm, IntTerm, ListTerm, VarTerm
+
+
+def round_trip(term):
+    writer = TermWriter()
+    writer.write_term(term)
+    return TermReader(writer.data()).read_term()
+
+
+class TestSerialization(unittest.TestCase):
+    def test_program(self):
+        term = Parser.term("block([assign(a, 0), while(leq(retrieve(a), 300), write(add(retrieve(a), 1))), []])")
+
+        self.assertEqual(term.to_string(), round_trip(term).to_string())
+
+    def test_numbers(self):
+        term = ApplTerm("n", [IntTerm(0), IntTerm(-1), IntTerm(127), IntTerm(128), IntTerm(-70000), IntTerm(2 ** 40)])
+
+        self.assertEqual(term.to_string(), round_trip(term).to_string())
+
+    def test_patterns_and_environments(self):
+        rule = Parser.rule("E |- a([x | xs], E[k]) --> {k |--> x, E}")
+
+        self.assertEqual(rule.before.to_string(), round_trip(rule.before).to_string())
+        self.assertEqual(rule.after.to_string(), round_trip(rule.after).to_string())
+
+    def test_names_written_once(self):
+        writer = TermWriter()
+        writer.write_term(Parser.term("a(a, a(a))"))
+
+        self.assertEqual(1, writer.data().count("a"))
+
+    def test_deeply_nested_term(self):
+        term = ListTerm()
+        for i in range(10000):
+            term = ApplTerm("a", [term, VarTerm("x")])
+
+        read = round_trip(term)
+
+        for i in range(10000):
+            read = read.args[0]
+        self.assertIsInstance(read, ListTerm)
+
+    def test_truncated_data(self):
+        writer = TermWriter()
+        writer.write_term(Parser.term("a(b, c)"))
+
+        with self.assertRaises(SerializationError):
+            TermReader(writer.data()[:-3]).read_term()
+
+    def test_program_for_other_source(self):
+        term = Parser.term("a(1)")
+        data = write_program(term, 4, 1500000000000000)
+
+        self.assertEqual(term, read_program(data, 4, 1500000000000000))
+        self.assertIsNone(read_program(data, 5, 1500000000000000))
+        self.assertIsNone(read_program(data, 4, 1500000000000001))
+        self.assertIsNone(read_program("not a program", 4, 1500000000000000))
+
+    def test_program_for_source_modified_before_1970(self):
+        term = Parser.term("a(1)")
+
+        self.assertEqual(term, read_program(write_program(term, 4, -1000000), 4, -1000000))
+
+
+
+class TestModuleSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.native_functions = e2.native_functions
+
+    def test_round_trip(self):
+        built = e2.build()
+
+        loaded = read_module(write_module(built, 42), 42, self.native_functions)
+
+        self.assertEqual([r.to_string() for r in built.rules], [r.to_string() for r in loaded.rules])
+        self.assertEqual([r.number_of_bound_terms for r in built.rules],
+                         [r.number_of_bound_terms for r in loaded.rules])
+        self.assertEqual([r.has_loop for r in built.rules], [r.has_loop for r in loaded.rules])
+        self.assertEqual([n.before.to_string() for n in built.native_functions],
+                         [n.before.to_string() for n in loaded.native_functions])
+
+    def test_run_loaded_module(self):
+        module = read_module(write_module(e2.build(), 42), 42, self.native_functions)
+        output = MemoryOutput()
+        term = Parser.term("block([assign(a, 0), while(leq(retrieve(a), 2), block([assign(a, add(retrieve(a), 1)), "
+                           "write(retrieve(a))]))])")
+
+        Interpreter(module, 0, None, output).interpret(term)
+
+        self.assertEqual("1\n2\n3\n", output.value())
+
+    def test_out_of_date_snapshot(self):
+        self.assertIsNone(read_module(write_module(e2.build(), 42), 43, self.native_functions))
+
+    def test_missing_action(self):
+        with self.assertRaises(SerializationError):
+            read_module(write_module(e2.build(), 42), 42, [])
+
+    def test_changed_native_signature(self):
+        changed = [NativeFunction(n.before, lambda output, x, y: x, TERM_KIND, TERM_KIND) if n.before.name == "add"
+                   else n for n in e2.native_functions]
+
+        with self.assertRaises(SerializationError):
+            read_module(write_module(e2.build(), 42), 42, changed)
+
+    def test_load_takes_a_snapshot(self):
+        directory = tempfile.mkdtemp()
+        try:
+            snapshot = os.path.join(directory, "e2.dsc")
+
+            built = e2.load(snapshot)
+            loaded = e2.load(snapshot)
+
+            self.assertEqual(["e2.dsc"], os.listdir(directory))
+            self.assertEqual(len(built.rules), len(loaded.rules))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
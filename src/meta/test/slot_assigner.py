@@ -21,14 +21,14 @@ class TestSlotAssigner(unittest.TestCase):
 
         assigned = sut.assign_rule(rule.before, rule.after, rule.premises)
 
-        self.assertEqual(3, assigned)
+        self.assertEqual(2, assigned)
         self.assertEqual(0, rule.before.args[0].slot)  # a(x)
         self.assertEqual(0, rule.premises[0].left.slot)  # x == 1
         self.assertEqual(1, rule.premises[1].left.args[0].slot)  # b(y) => x
         self.assertEqual(0, rule.premises[1].right.slot)  # b(y) => x
         self.assertEqual(1, rule.premises[2].left.slot)  # y --> z
-        self.assertEqual(2, rule.premises[2].right.slot)  # y --> z
-        self.assertEqual(2, rule.after.items[0].slot)  # [z]
+        self.assertEqual(0, rule.premises[2].right.slot)  # y --> z, reusing the slot of x
+        self.assertEqual(0, rule.after.items[0].slot)  # [z]
 
     def test_slots_on_block(self):
         sut = SlotAssigner()
@@ -36,7 +36,27 @@ class TestSlotAssigner(unittest.TestCase):
 
         assigned = sut.assign_rule(rule.before, rule.after, rule.premises)
 
+        self.assertEqual(2, assigned)
+        self.assertEqual(-1, rule.premises[0].right.slot)  # y is never resolved, so it is not bound
+
+    def test_slots_are_not_reused_within_a_premise(self):
+        sut = SlotAssigner()
+        rule = Parser.rule("a(x) --> y where x --> y.")
+
+        assigned = sut.assign_rule(rule.before, rule.after, rule.premises)
+
+        self.assertEqual(2, assigned)
+        self.assertEqual(1, rule.premises[0].right.slot)
+
+    def test_rebinding_keeps_the_slot(self):
+        sut = SlotAssigner()
+        rule = Parser.rule("a(x) --> w where x --> y; y --> w; y --> x.")
+
+        assigned = sut.assign_rule(rule.before, rule.after, rule.premises)
+
         self.assertEqual(3, assigned)
+        self.assertEqual(0, rule.premises[2].right.slot)  # x, bound again after it was last resolved
+        self.assertEqual(2, rule.premises[1].right.slot)  # so w cannot take the slot of x
 
 
 if __name__ == '__main__':
@@ -0,0 +1,82 @@
+import unittest
+
+from src.meta.dynsem import Module, NativeFunction, TERM_KIND
+from src.meta.parser import Parser
+from src.meta.stack_interpreter import StackInterpreter
+from src.meta.test.engine import EngineTests, e2
+from src.meta.term import ApplTerm, IntTerm, ListTerm, VarTerm
+
+
+class TestStackInterpreter(EngineTests, unittest.TestCase):
+    engine = StackInterpreter
+
+    def test_recursive_contexts(self):
+        module = Module([Parser.rule("ifz(cond, then, else) --> ifzc(value, then, else) where cond --> value"),
+                         Parser.rule("ifzc(0, then, else) --> then"), Parser.rule("ifzc(nonzero, then, else) --> else")])
+
+        result = StackInterpreter(module).interpret(Parser.term("ifz(ifz(1, 2, 3), 4, 5)"))
+
+        self.assertEqual(IntTerm(5), result)
+
+    def test_deeply_nested_native_arguments(self):
+        add = NativeFunction(Parser.native_function("add(x, y)"), lambda output, x, y: x + y)
+        term = IntTerm(0)
+        for i in range(10000):
+            term = ApplTerm("add", [IntTerm(1), term])
+
+        result = StackInterpreter(Module([], [add])).interpret(term)
+
+        self.assertEqual(IntTerm(10000), result)
+
+    def test_native_arguments_in_order(self):
+        digits = NativeFunction(Parser.native_function("digits(a, b, c, d)"),
+                                lambda output, a, b, c, d: a * 1000 + b * 100 + c * 10 + d)
+        second = NativeFunction(Parser.native_function("second(a, b, c)"), lambda output, a, b, c: b, TERM_KIND,
+                                TERM_KIND)
+        module = Module([], [digits, second])
+
+        self.assertEqual(IntTerm(1234), StackInterpreter(module).interpret(Parser.term("digits(1, 2, 3, 4)")))
+        self.assertEqual(ApplTerm("y"), StackInterpreter(module).interpret(Parser.term("second(x(), y(), z())")))
+
+    def test_deeply_nested_e2_blocks(self):
+        interpreter = StackInterpreter(e2)
+        term = ApplTerm("assign", [VarTerm("a"), IntTerm(0)])
+        for i in range(10000):
+            term = ApplTerm("block", [ListTerm([term, ApplTerm("assign", [VarTerm("a"), ApplTerm("add", [
+                ApplTerm("retrieve", [VarTerm("a")]), IntTerm(1)])])])])
+
+        result = interpreter.interpret(term)
+
+        self.assertEqual(ApplTerm("block"), result)
+        self.assertEqual(IntTerm(10000), interpreter.environment.locate_and_get("a"))
+
+    def test_e2_sumprimes(self):
+        interpreter = StackInterpreter(e2)
+        term = Parser.term("""
+        block([
+          assign(s, 0),
+          assign(n, 2),
+          while(leq(retrieve(n), 20),
+            block([
+              assign(p, 1),
+              assign(d, 2),
+              while(leq(retrieve(d), sub(retrieve(n), 1)),
+                block([
+                  ifz(leq(retrieve(n), mul(retrieve(d), div(retrieve(n), retrieve(d)))), assign(p, 0), block()),
+                  assign(d, add(retrieve(d), 1))
+                ])
+              ),
+              ifz(retrieve(p), assign(s, add(retrieve(s), retrieve(n))), block()),
+              assign(n, add(retrieve(n), 1))
+            ])
+          )
+        ])
+        """)
+
+        interpreter.interpret(term)
+
+        self.assertEqual(IntTerm(77), interpreter.environment.locate_and_get("s"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from src.meta.parser import Parser
+from src.meta.symbols import SymbolTable, symbols
+
+
+class TestSymbolTable(unittest.TestCase):
+    def test_intern(self):
+        sut = SymbolTable()
+
+        a = sut.intern("a")
+        b = sut.intern("b")
+
+        self.assertEqual(0, a)
+        self.assertEqual(1, b)
+        self.assertEqual(a, sut.intern("a"))
+        self.assertEqual("b", sut.name_of(b))
+        self.assertEqual(2, sut.size())
+
+    def test_terms_share_symbols(self):
+        term = Parser.term("a(b, a)")
+
+        self.assertEqual(symbols.intern("a"), term.symbol)
+        self.assertEqual(term.symbol, term.args[1].symbol)
+        self.assertNotEqual(term.symbol, term.args[0].symbol)
+
+
+if __name__ == '__main__':
+    unittest.main()
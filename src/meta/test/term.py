@@ -1,6 +1,7 @@
 import unittest
 
 from src.meta.parser import Parser
+from src.meta.term import ListTerm, IntTerm, TermTable, int_term, mark_ground
 
 
 class TestTerm(unittest.TestCase):
@@ -36,6 +37,99 @@ class TestTerm(unittest.TestCase):
         self.assertEquals(Parser.term("[1, a(b), {c |--> d}]"), Parser.term("[1, a(b), {c |--> d}]"))
         self.assertNotEquals(Parser.term("hello(world)"), Parser.term("hello[world]"))
 
+    def test_list_tail(self):
+        list = Parser.term("[1, a(b), [2, 3], 4]")
+
+        tail = list.tail(2)
+
+        self.assertIs(list.items, tail.items)
+        self.assertEqual(2, tail.length())
+        self.assertEqual(IntTerm(4), tail.get(1))
+        self.assertEqual(Parser.term("[[2, 3], 4]"), tail)
+        self.assertTrue(tail.equals(Parser.term("[[2, 3], 4]")))
+        self.assertEqual(Parser.term("[[2, 3], 4]").hash, tail.hash)
+        self.assertEqual("[[2, 3], 4]", tail.to_string())
+
+    def test_empty_list_tail(self):
+        tail = Parser.term("[1, 2]").tail(1).tail(1)
+
+        self.assertEqual(0, tail.length())
+        self.assertEqual(ListTerm(), tail)
+        self.assertEqual(ListTerm().hash, tail.hash)
+        self.assertTrue(Parser.term("[x | xs]").matches(Parser.term("[1, 2]").tail(1)))
+        self.assertFalse(Parser.term("[x | xs]").matches(tail))
+
+    def test_interning(self):
+        sut = TermTable()
+
+        a1 = sut.appl("a", [sut.integer(1), sut.list([sut.integer(2)])])
+        a2 = sut.appl("a", [sut.integer(1), sut.list([sut.integer(2)])])
+        b = sut.appl("a", [sut.integer(1), sut.list([sut.integer(3)])])
+
+        self.assertIs(a1, a2)
+        self.assertIsNot(a1, b)
+        self.assertEqual(Parser.term("a(1, [2])"), a1)
+        self.assertIs(sut.appl("a", [IntTerm(1), Parser.term("[2]")]), a1)
+
+    def test_small_integers(self):
+        self.assertIs(int_term(42), int_term(42))
+        self.assertIs(int_term(7), Parser.term("7"))
+        self.assertIsNot(int_term(10 ** 9), int_term(10 ** 9))
+        self.assertEqual(IntTerm(10 ** 9), int_term(10 ** 9))
+
+    def test_interning_is_bounded(self):
+        sut = TermTable(4)
+
+        first = sut.appl("a", [])
+        for i in range(1, 10):
+            sut.appl("a", [IntTerm(i)])
+
+        self.assertLessEqual(sut.size, 4)
+        self.assertIsNot(first, sut.appl("a", []))
+        self.assertTrue(first.equals(sut.appl("a", [])))
+
+    def test_only_ground_terms_are_interned(self):
+        sut = TermTable()
+
+        with_variable = Parser.term("a(x)")
+        with_map = Parser.term("a({b |--> 1})")
+
+        self.assertIsNot(sut.appl("a", with_variable.args), sut.appl("a", with_variable.args))
+        self.assertIsNot(sut.appl("a", with_map.args), sut.appl("a", with_map.args))
+        self.assertIsNot(sut.list(with_map.args), sut.list(with_map.args))
+        self.assertEqual(0, sut.size)
+
+    def test_interned_terms_are_compared_strictly(self):
+        sut = TermTable()
+
+        a = sut.appl("a", [sut.list([sut.integer(1), sut.integer(2)])])
+        tail = Parser.term("[0, 1, 2]").tail(1)
+
+        self.assertTrue(tail.internable)
+        self.assertIs(a, sut.appl("a", [tail]))
+        self.assertIsNot(a, sut.appl("a", [sut.list([sut.integer(1)])]))
+
+    def test_ground_terms(self):
+        term = Parser.term("a(b(1, [c]), d(x), [])")
+        term.args[1].args[0].slot = 0  # x is bound
+
+        self.assertFalse(mark_ground(term))
+        self.assertTrue(term.args[0].ground)
+        self.assertTrue(term.args[0].args[1].ground)
+        self.assertFalse(term.args[1].ground)
+
+    def test_applications_with_empty_lists_are_not_ground(self):
+        term = Parser.term("a(b, [])")
+
+        self.assertFalse(mark_ground(term))
+        self.assertTrue(mark_ground(term.args[1]))
+
+    def test_ground_flag_is_not_compared(self):
+        term = Parser.term("a(b)")
+        mark_ground(term)
+
+        self.assertEqual(Parser.term("a(b)"), term)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -9,7 +9,7 @@ class TestTokenizer(unittest.TestCase):
             raise AssertionError("Lengths do not match: {} != {}".format(expected, actual))
         for i, e in enumerate(expected):
             self.assertIsInstance(actual[i], e.__class__)
-            self.assertEqual(e.location, actual[i].location) if e.location else None
+            self.assertEqual(e.offset, actual[i].offset) if e.offset >= 0 else None
             self.assertEqual(e.value, actual[i].value) if e.value else None
 
     def test_header(self):
@@ -63,7 +63,7 @@ class TestTokenizer(unittest.TestCase):
 
         tokens = [sut.next() for i in range(7)]
 
-        expected = [LeftParensToken(), IdToken(None, 'String'), CommaToken(), IdToken(None, 'V'), RightParensToken()]
+        expected = [LeftParensToken(), IdToken(-1, 'String'), CommaToken(), IdToken(-1, 'V'), RightParensToken()]
         self.assertTokensEqual(expected, tokens[2:7])
 
     def test_rules(self):
@@ -87,6 +87,50 @@ class TestTokenizer(unittest.TestCase):
         self.assertEqual(token.value, "a/b/c/1")
         self.assertIsInstance(eof, EofToken)
 
+    def test_runs(self):
+        sut = Tokenizer("ab12|-->345 of")
+
+        tokens = [sut.next() for i in range(5)]
+
+        expected = [IdToken(-1, 'ab12'), OperatorToken(-1, '|-->'), NumberToken(-1, '345'),
+                    KeywordToken(-1, 'of'), EofToken()]
+        self.assertTokensEqual(expected, tokens)
+
+    def test_locations(self):
+        text = "a\n  bc(\n\nd"
+        sut = Tokenizer(text, "test.ds")
+
+        tokens = [sut.next() for i in range(5)]
+
+        self.assertEqual([0, 4, 6, 9, 10], [t.offset for t in tokens])
+        self.assertEqual([(1, 1), (2, 3), (2, 5), (4, 1), (4, 2)],
+                         [(sut.location(t).line, sut.location(t).offset) for t in tokens])
+        self.assertEqual("test.ds:2", repr(sut.location(tokens[1])))
+
+
+class TestTokenStream(unittest.TestCase):
+    def test_kinds_and_values(self):
+        sut = TokenStream("a(12) --> b")
+
+        self.assertEqual([ID_KIND, LEFT_PARENS_KIND, NUMBER_KIND, RIGHT_PARENS_KIND, OPERATOR_KIND, ID_KIND, EOF_KIND],
+                         sut.kinds)
+        self.assertEqual("a", sut.value())
+        self.assertIsNone(sut.value(1))
+        self.assertEqual("12", sut.value(2))
+        self.assertTrue(sut.value_is("-->", 4))
+        self.assertFalse(sut.value_is("->", 4))
+
+    def test_ends_at_eof(self):
+        sut = TokenStream("a")
+
+        sut.advance()
+        sut.advance()
+
+        self.assertEqual(EOF_KIND, sut.kind())
+        self.assertEqual(EOF_KIND, sut.kind(3))
+        self.assertIsInstance(sut.token(), EofToken)
+        self.assertEqual(1, sut.token().offset)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -8,29 +8,117 @@ class Location:
         return "%s:%s" % (self.file if self.file else "<code string>", self.line)
 
 
+class LineIndex:
+    """The offsets at which each line of a text starts, for resolving text offsets to Locations only when they are
+    needed (e.g. for error messages); the index is built on the first lookup"""
+
+    def __init__(self, text, file=None):
+        self.text = text
+        self.file = file
+        self.line_starts = None
+
+    def location(self, offset):
+        if self.line_starts is None:
+            self.line_starts = [0]
+            for i in range(len(self.text)):
+                if self.text[i] == '\n':
+                    self.line_starts.append(i + 1)
+
+        # binary search for the last line starting at or before the offset
+        low = 0
+        high = len(self.line_starts) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.line_starts[middle] <= offset:
+                low = middle
+            else:
+                high = middle - 1
+        return Location(offset - self.line_starts[low] + 1, low + 1, self.file)
+
+
 class Token:
-    def __init__(self, location=None, value=None):
-        self.location = location
+    """A token starting at the offset into the tokenized text (or -1 if unknown); see Tokenizer.location"""
+
+    def __init__(self, offset=-1, value=None):
+        self.offset = offset
         self.value = value
 
     def __repr__(self):
-        return "%s%s at %s" % (self.__class__.__name__, "=" + self.value if self.value else "", self.location)
-
-
-class EofToken(Token): pass
-class NumberToken(Token): pass
-class IdToken(Token): pass
-class KeywordToken(Token): pass
-class OperatorToken(Token): pass
-class LeftParensToken(Token): pass
-class RightParensToken(Token): pass
-class LeftBraceToken(Token): pass
-class RightBraceToken(Token): pass
-class LeftBracketToken(Token): pass
-class RightBracketToken(Token): pass
-class PeriodToken(Token): pass
-class CommaToken(Token): pass
-class SemiColonToken(Token): pass
+        return "%s%s at %d" % (self.__class__.__name__, "=" + self.value if self.value else "", self.offset)
+
+
+# token kinds, as used by TokenStream and Token.kind
+EOF_KIND = 0
+NUMBER_KIND = 1
+ID_KIND = 2
+KEYWORD_KIND = 3
+OPERATOR_KIND = 4
+LEFT_PARENS_KIND = 5
+RIGHT_PARENS_KIND = 6
+LEFT_BRACE_KIND = 7
+RIGHT_BRACE_KIND = 8
+LEFT_BRACKET_KIND = 9
+RIGHT_BRACKET_KIND = 10
+PERIOD_KIND = 11
+COMMA_KIND = 12
+SEMICOLON_KIND = 13
+KIND_NAMES = ["EofToken", "NumberToken", "IdToken", "KeywordToken", "OperatorToken", "LeftParensToken",
+              "RightParensToken", "LeftBraceToken", "RightBraceToken", "LeftBracketToken", "RightBracketToken",
+              "PeriodToken", "CommaToken", "SemiColonToken"]
+
+
+class EofToken(Token): kind = EOF_KIND
+class NumberToken(Token): kind = NUMBER_KIND
+class IdToken(Token): kind = ID_KIND
+class KeywordToken(Token): kind = KEYWORD_KIND
+class OperatorToken(Token): kind = OPERATOR_KIND
+class LeftParensToken(Token): kind = LEFT_PARENS_KIND
+class RightParensToken(Token): kind = RIGHT_PARENS_KIND
+class LeftBraceToken(Token): kind = LEFT_BRACE_KIND
+class RightBraceToken(Token): kind = RIGHT_BRACE_KIND
+class LeftBracketToken(Token): kind = LEFT_BRACKET_KIND
+class RightBracketToken(Token): kind = RIGHT_BRACKET_KIND
+class PeriodToken(Token): kind = PERIOD_KIND
+class CommaToken(Token): kind = COMMA_KIND
+class SemiColonToken(Token): kind = SEMICOLON_KIND
+
+
+def has_value(kind):
+    return kind == NUMBER_KIND or kind == ID_KIND or kind == KEYWORD_KIND or kind == OPERATOR_KIND
+
+
+def new_token(kind, offset, value=None):
+    """Create the Token object for a kind of token"""
+    if kind == EOF_KIND:
+        return EofToken(offset)
+    elif kind == NUMBER_KIND:
+        return NumberToken(offset, value)
+    elif kind == ID_KIND:
+        return IdToken(offset, value)
+    elif kind == KEYWORD_KIND:
+        return KeywordToken(offset, value)
+    elif kind == OPERATOR_KIND:
+        return OperatorToken(offset, value)
+    elif kind == LEFT_PARENS_KIND:
+        return LeftParensToken(offset)
+    elif kind == RIGHT_PARENS_KIND:
+        return RightParensToken(offset)
+    elif kind == LEFT_BRACE_KIND:
+        return LeftBraceToken(offset)
+    elif kind == RIGHT_BRACE_KIND:
+        return RightBraceToken(offset)
+    elif kind == LEFT_BRACKET_KIND:
+        return LeftBracketToken(offset)
+    elif kind == RIGHT_BRACKET_KIND:
+        return RightBracketToken(offset)
+    elif kind == PERIOD_KIND:
+        return PeriodToken(offset)
+    elif kind == COMMA_KIND:
+        return CommaToken(offset)
+    elif kind == SEMICOLON_KIND:
+        return SemiColonToken(offset)
+    else:
+        raise ValueError("Unknown kind of token: %d" % kind)
 # TODO path token?
 
 
@@ -40,47 +128,91 @@ class TokenError(Exception):
         self.location = location
 
 
+# character classes, as bit flags in a table indexed by character code
+WHITESPACE = 1
+ID = 2
+OPERATOR = 4
+NUMBER = 8
+
+
+def build_character_classes():
+    classes = [0] * 256
+    for chars, character_class in [(' \t\n', WHITESPACE),
+                                   ('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ/', ID),
+                                   ('+-*/<>=:|', OPERATOR),
+                                   ('0123456789', NUMBER)]:
+        for c in chars:
+            classes[ord(c)] |= character_class
+    return classes
+
+
+CHARACTER_CLASSES = build_character_classes()
+KEYWORDS = {}  # used as a set; never modified after this
+MAXIMUM_KEYWORD_LENGTH = 0
+for keyword in ["module", "imports", "signature", "constructors", "arrows", "components", "native", "rules", "where",
+                "case", "of", "otherwise"]:
+    KEYWORDS[keyword] = True
+    MAXIMUM_KEYWORD_LENGTH = max(MAXIMUM_KEYWORD_LENGTH, len(keyword))
+
+
+def character_class(c):
+    code = ord(c)
+    return CHARACTER_CLASSES[code] if code < 256 else 0
 def is_whitespace(c):
-    return c in ' \t\n'
+    return character_class(c) & WHITESPACE != 0
 def is_id_char(c):
-    return c in 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ/'
+    return character_class(c) & ID != 0
 def is_keyword(id):
-    return id in ["module", "imports", "signature", "constructors", "arrows", "components", "native", "rules", "where",
-                  "case", "of", "otherwise"]
+    return id in KEYWORDS
 def is_operator_char(c):
-    return c in '+-*/<>=:|'
+    return character_class(c) & OPERATOR != 0
 def is_number_char(c):
-    return c in '0123456789'
+    return character_class(c) & NUMBER != 0
+
 
 class Tokenizer:
     def __init__(self, text, file=None):
         self.text = text
         self.global_offset = 0
-        self.line_offset = 0
-        self.line = 1
-        self.file = file
+        self.lines = LineIndex(text, file)
         self.in_line_comment = False
         self.in_multiline_comment = False
-        self.history = []
+        self.start = 0  # the offsets of the text of the last token scanned
+        self.end = 0
 
     def current_location(self):
-        return Location(self.line_offset, self.line, self.file)
+        return self.lines.location(self.global_offset - 1)
+
+    def location(self, token):
+        """Resolve the Location of a token read by this tokenizer"""
+        return self.lines.location(token.offset)
 
     def next(self):
-        """Retrieve the next token from the text"""
-        if len(self.history) > 0: return self.history.pop(0)
-        token = None
-        while not token:
+        """Retrieve the next token from the text; the parser reads through a TokenStream instead"""
+        return self.__scan()
+
+    def __scan(self):
+        kind = self.scan()
+        start = self.start
+        end = self.end
+        assert start >= 0 and end >= 0
+        value = self.text[start:end] if has_value(kind) else None
+        return new_token(kind, self.start, value)
+
+    def scan(self):
+        """Scan the next token without creating an object for it: return its kind and leave the offsets of its text
+        in start and end"""
+        kind = -1
+        while kind < 0:
+            self.start = self.global_offset
             c = self.__read()
             if c == '':
                 if self.in_line_comment or self.in_multiline_comment:
                     raise TokenError("Unmatched open comment", self.current_location())
                 else:
-                    token = EofToken(self.current_location())
+                    kind = EOF_KIND
             # new lines
             elif c == '\n':
-                self.line += 1
-                self.line_offset = 0
                 self.in_line_comment = False
                 continue
             # comments
@@ -100,54 +232,45 @@ class Tokenizer:
                 continue
             # delimiters
             elif c == '(':
-                token = LeftParensToken(self.current_location())
+                kind = LEFT_PARENS_KIND
             elif c == ')':
-                token = RightParensToken(self.current_location())
+                kind = RIGHT_PARENS_KIND
             elif c == '{':
-                token = LeftBraceToken(self.current_location())
+                kind = LEFT_BRACE_KIND
             elif c == '}':
-                token = RightBraceToken(self.current_location())
+                kind = RIGHT_BRACE_KIND
             elif c == '[':
-                token = LeftBracketToken(self.current_location())
+                kind = LEFT_BRACKET_KIND
             elif c == ']':
-                token = RightBracketToken(self.current_location())
+                kind = RIGHT_BRACKET_KIND
             elif c == ',':
-                token = CommaToken(self.current_location())
+                kind = COMMA_KIND
             elif c == ';':
-                token = SemiColonToken(self.current_location())
+                kind = SEMICOLON_KIND
             elif c == '.':
-                token = PeriodToken(self.current_location())
+                kind = PERIOD_KIND
             # IDs and keywords
             elif is_id_char(c):
-                location = self.current_location()
-                value = self.__read_all_of(c, lambda c: is_id_char(c) or is_number_char(c))
-                token = KeywordToken(location, value) if is_keyword(value) else IdToken(location, value)
+                self.__read_run(ID | NUMBER)
+                kind = KEYWORD_KIND if self.__is_keyword() else ID_KIND
             # operators
             elif is_operator_char(c):
-                location = self.current_location()
-                value = self.__read_all_of(c, is_operator_char)
-                token = OperatorToken(location, value)
+                self.__read_run(OPERATOR)
+                kind = OPERATOR_KIND
             # numbers
             elif is_number_char(c):
-                location = self.current_location()
-                value = self.__read_all_of(c, is_number_char)
-                token = NumberToken(location, value)
+                self.__read_run(NUMBER)
+                kind = NUMBER_KIND
             else:
                 raise TokenError('Invalid character: ' + c, self.current_location())
 
-        return token
-
-    def undo(self, token):
-        """Undo the last next operation"""
-        if not isinstance(token, Token):
-            raise ValueError("Attempted to undo a non-token")
-        self.history.append(token)
+        self.end = self.global_offset
+        return kind
 
     def __read(self):
         if self.global_offset < len(self.text):
             char = self.text[self.global_offset]
             self.global_offset += 1
-            self.line_offset += 1
             return char
         else:
             return ''
@@ -158,13 +281,76 @@ class Tokenizer:
         else:
             return ''
 
-    def __unread(self):
-        self.global_offset -= 1
+    def __read_run(self, character_classes):
+        """Read the rest of a run of characters in any of the classes"""
+        end = self.global_offset
+        while end < len(self.text) and character_class(self.text[end]) & character_classes != 0:
+            end += 1
+        self.global_offset = end
 
-    def __read_all_of(self, value, match_function):
-        c = self.__read()
-        while c != '' and match_function(c):
-            value += c
-            c = self.__read()
-        if c != '': self.__unread()
-        return value
+    def __is_keyword(self):
+        """Check if the identifier just read is a keyword; most identifiers are too long to be one"""
+        if self.global_offset - self.start > MAXIMUM_KEYWORD_LENGTH:
+            return False
+        start = self.start
+        end = self.global_offset
+        assert start >= 0 and end >= 0
+        return is_keyword(self.text[start:end])
+
+
+class TokenStream:
+    """All tokens of a text as parallel arrays of their kinds and start and end offsets, without a Token object per
+    token; values are sliced from the text only when asked for. The stream is read at a position, looking ahead of it
+    as far as needed, and ends in an EOF token that is never advanced past."""
+
+    def __init__(self, text, file=None):
+        tokenizer = Tokenizer(text, file)
+        self.text = text
+        self.lines = tokenizer.lines
+        self.kinds = []
+        self.starts = []
+        self.ends = []
+        while True:
+            kind = tokenizer.scan()
+            self.kinds.append(kind)
+            self.starts.append(tokenizer.start)
+            self.ends.append(tokenizer.end)
+            if kind == EOF_KIND:
+                break
+        self.position = 0
+
+    def index(self, ahead=0):
+        index = self.position + ahead
+        last = len(self.kinds) - 1
+        return index if index < last else last
+
+    def kind(self, ahead=0):
+        return self.kinds[self.index(ahead)]
+
+    def value(self, ahead=0):
+        """Slice the value of a number, ID, keyword or operator token; other kinds of tokens have no value"""
+        index = self.index(ahead)
+        if not has_value(self.kinds[index]):
+            return None
+        start = self.starts[index]
+        end = self.ends[index]
+        assert start >= 0 and end >= 0
+        return self.text[start:end]
+
+    def value_is(self, expected, ahead=0):
+        """Check the value of a token, only slicing it if it has the expected length"""
+        index = self.index(ahead)
+        if self.ends[index] - self.starts[index] != len(expected):
+            return False
+        return self.value(ahead) == expected
+
+    def advance(self):
+        if self.position < len(self.kinds) - 1:
+            self.position += 1
+
+    def token(self, ahead=0):
+        """Create a Token object, e.g. for an error message"""
+        return new_token(self.kind(ahead), self.starts[self.index(ahead)], self.value(ahead))
+
+    def location(self, ahead=0):
+        return self.lines.location(self.starts[self.index(ahead)])